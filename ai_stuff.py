@@ -1,10 +1,19 @@
 # complete_app.py - Complete FastAPI application with models and endpoints
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
-from sqlmodel import SQLModel, Field, Relationship, JSON, Column, Session, select, create_engine
-from sqlalchemy import DateTime, func, and_
-from fastapi import FastAPI, HTTPException, Depends
+from collections import OrderedDict
+import threading
+import time
+from sqlmodel import SQLModel, Field, Relationship, JSON, Column, Session, select
+from sqlalchemy import DateTime, func, and_, update
+from sqlalchemy.dialects.sqlite import insert
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
+from anyio import to_thread
 import json
+import os
+from db_engine import create_tuned_engine, pool_stats
+from catalog_cache import CatalogCache, etag_matches
+from migrations import Migration, migrate
 
 # ==================== MODELS ====================
 
@@ -44,6 +53,7 @@ class MCPServer(MCPServerBase, table=True):
     connections: List["UserMCPConnection"] = Relationship(back_populates="server")
 
 class UserMCPConnection(UserMCPConnectionBase, table=True):
+    # Indexes come from MIGRATIONS below, not from the model
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime(timezone=True), server_default=func.now()))
     
@@ -97,15 +107,36 @@ class UserMCPConnectionUpdate(SQLModel):
 # Response models for API endpoints
 class MCPServerListResponse(SQLModel):
     servers: List[MCPServerRead]
+    next_after: Optional[int] = None  # pass as ?after= for the next page
 
 class UserConnectionsResponse(SQLModel):
     connections: List[UserMCPConnectionRead]
+    next_after: Optional[int] = None  # pass as ?after= for the next page
 
 class ConnectionResponse(SQLModel):
     message: str
     server_id: int
     connection_id: Optional[int] = None
 
+class BatchConnectItem(SQLModel):
+    server_id: int
+    connection_config: Optional[Dict[str, Any]] = None
+
+class BatchConnectRequest(SQLModel):
+    servers: List[BatchConnectItem]
+
+class BatchDisconnectRequest(SQLModel):
+    server_ids: List[int]
+
+class BatchItemResult(SQLModel):
+    server_id: int
+    success: bool
+    connection_id: Optional[int] = None
+    detail: Optional[str] = None
+
+class BatchConnectionResponse(SQLModel):
+    results: List[BatchItemResult]
+
 # Database initialization and sample data
 def create_sample_mcp_servers():
     """Sample MCP servers to insert into database"""
@@ -191,38 +222,59 @@ class MCPDatabaseOperations:
     
     def create_or_update_user(self, user_data: UserCreate) -> User:
         """Create or update user from OAuth data"""
-        # Check if user exists
-        statement = select(User).where(User.user_id == user_data.user_id)
-        existing_user = self.session.exec(statement).first()
-        
-        if existing_user:
-            # Update existing user
-            existing_user.email = user_data.email
-            existing_user.name = user_data.name
-            self.session.add(existing_user)
-            self.session.commit()
-            self.session.refresh(existing_user)
-            return existing_user
-        else:
-            # Create new user
-            user = User(**user_data.dict())
-            self.session.add(user)
-            self.session.commit()
-            self.session.refresh(user)
-            return user
+        # Single INSERT ... ON CONFLICT DO UPDATE: no read-then-write race
+        statement = insert(User).values(
+            user_id=user_data.user_id,
+            email=user_data.email,
+            name=user_data.name
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[User.user_id],
+            set_={"email": statement.excluded.email, "name": statement.excluded.name}
+        ).returning(User)
+        user = self.session.scalars(statement, execution_options={"populate_existing": True}).one()
+        self.session.commit()
+        return user
+    
+    def get_or_create_user(self, user_data: UserCreate) -> User:
+        """Get user, creating it from user_data if missing; never overwrites an existing user"""
+        statement = insert(User).values(
+            user_id=user_data.user_id,
+            email=user_data.email,
+            name=user_data.name
+        ).on_conflict_do_nothing(index_elements=[User.user_id])
+        self.session.execute(statement)
+        self.session.commit()
+        return self.session.exec(select(User).where(User.user_id == user_data.user_id)).one()
     
     def get_available_mcp_servers(self) -> List[MCPServer]:
-        """Get all active MCP servers"""
-        statement = select(MCPServer).where(MCPServer.is_active == True)
+        """Get all active MCP servers, ordered by id"""
+        statement = select(MCPServer).where(MCPServer.is_active == True).order_by(MCPServer.id)
         return self.session.exec(statement).all()
     
-    def get_user_connections(self, user_id: str) -> List[UserMCPConnectionRead]:
-        """Get user's MCP connections with server details"""
+    def get_user_connections(
+        self,
+        user_id: str,
+        after: Optional[int] = None,
+        limit: Optional[int] = None,
+        is_connected: Optional[bool] = None
+    ) -> List[UserMCPConnectionRead]:
+        """Get user's MCP connections with server details, ordered by server id
+        
+        Keyset pagination: pass the last server_id seen as after; the
+        (user_id, server_id) index serves both the filter and the order.
+        """
         statement = select(
             UserMCPConnection,
             MCPServer.name,
             MCPServer.config
-        ).join(MCPServer).where(UserMCPConnection.user_id == user_id)
+        ).join(MCPServer).where(UserMCPConnection.user_id == user_id).order_by(UserMCPConnection.server_id)
+        if after is not None:
+            statement = statement.where(UserMCPConnection.server_id > after)
+        if is_connected is not None:
+            statement = statement.where(UserMCPConnection.is_connected == is_connected)
+        if limit is not None:
+            statement = statement.limit(limit)
         
         results = self.session.exec(statement).all()
         
@@ -237,103 +289,168 @@ class MCPDatabaseOperations:
         
         return connections
     
-    def get_servers_with_user_status(self, user_id: str) -> List[MCPServerRead]:
-        """Get all servers with connection status for specific user"""
-        # Get all servers
-        servers = self.get_available_mcp_servers()
+    def get_servers_with_user_status(
+        self,
+        user_id: str,
+        after: Optional[int] = None,
+        limit: Optional[int] = None,
+        is_connected: Optional[bool] = None
+    ) -> List[MCPServerRead]:
+        """Get servers with connection status for specific user, ordered by id
         
-        # Get user's connected server IDs
-        statement = select(UserMCPConnection.server_id).where(
+        Keyset pagination: pass the last server id seen as after; the primary
+        key serves the order, so a page reads only the rows it returns.
+        """
+        # One LEFT OUTER JOIN: the joined connection id is NULL unless the
+        # user is connected to that server
+        statement = select(
+            MCPServer.id,
+            MCPServer.name,
+            MCPServer.server_id,
+            MCPServer.config,
+            MCPServer.is_active,
+            MCPServer.created_at,
+            UserMCPConnection.id.isnot(None)
+        ).outerjoin(
+            UserMCPConnection,
             and_(
+                UserMCPConnection.server_id == MCPServer.id,
                 UserMCPConnection.user_id == user_id,
                 UserMCPConnection.is_connected == True
             )
-        )
-        connected_server_ids = set(self.session.exec(statement).all())
+        ).where(MCPServer.is_active == True).order_by(MCPServer.id)
+        if after is not None:
+            statement = statement.where(MCPServer.id > after)
+        if is_connected is not None:
+            statement = statement.where(
+                UserMCPConnection.id.isnot(None) if is_connected else UserMCPConnection.id.is_(None)
+            )
+        if limit is not None:
+            statement = statement.limit(limit)
         
-        # Add connection status to servers
+        # Rows come straight from the database, so skip re-validating them.
+        # The unique (user_id, server_id) index means one row per server.
         server_reads = []
-        for server in servers:
-            server_read = MCPServerRead(
-                **server.dict(),
-                is_connected=server.id in connected_server_ids
-            )
-            server_reads.append(server_read)
+        for pk, name, server_id, config, is_active, created_at, is_connected in self.session.exec(statement):
+            server_reads.append(MCPServerRead.construct(
+                id=pk,
+                name=name,
+                server_id=server_id,
+                config=config,
+                is_active=is_active,
+                created_at=created_at,
+                is_connected=bool(is_connected)
+            ))
         
         return server_reads
     
+    def get_catalog_fingerprint(self) -> Tuple[int, Optional[int]]:
+        """Count and highest id of the active servers
+        
+        Servers are only ever added, so these change whenever the catalog does.
+        """
+        statement = select(func.count(), func.max(MCPServer.id)).where(MCPServer.is_active == True)
+        count, highest_id = self.session.exec(statement).one()
+        return count, highest_id
+    
     def connect_user_to_server(self, user_id: str, server_id: int, config: Optional[Dict] = None) -> UserMCPConnection:
         """Connect user to MCP server"""
-        # Check if connection already exists
-        statement = select(UserMCPConnection).where(
+        current_time = datetime.utcnow()
+        statement = insert(UserMCPConnection).values(
+            user_id=user_id,
+            server_id=server_id,
+            is_connected=True,
+            connection_config=config,
+            connected_at=current_time,
+            last_used=current_time
+        )
+        # Creates the connection or reconnects the existing one in one statement
+        statement = statement.on_conflict_do_update(
+            index_elements=[UserMCPConnection.user_id, UserMCPConnection.server_id],
+            set_={
+                "is_connected": True,
+                "connection_config": statement.excluded.connection_config,
+                "connected_at": statement.excluded.connected_at,
+                "last_used": statement.excluded.last_used
+            }
+        ).returning(UserMCPConnection)
+        connection = self.session.scalars(statement, execution_options={"populate_existing": True}).one()
+        self.session.commit()
+        return connection
+    
+    def disconnect_user_from_server(self, user_id: str, server_id: int) -> bool:
+        """Disconnect user from MCP server"""
+        statement = update(UserMCPConnection).where(
             and_(
                 UserMCPConnection.user_id == user_id,
                 UserMCPConnection.server_id == server_id
             )
-        )
-        existing_connection = self.session.exec(statement).first()
+        ).values(is_connected=False).execution_options(synchronize_session=False)
+        result = self.session.execute(statement)
+        self.session.commit()
+        return result.rowcount > 0
+    
+    def connect_user_to_servers(self, user_id: str, configs: Dict[int, Optional[Dict]]) -> Dict[int, Optional[int]]:
+        """Connect user to several MCP servers in one transaction
         
-        current_time = datetime.utcnow()
+        Returns connection id per requested server id, None for unknown servers.
+        """
+        server_ids = list(configs)
+        known_ids = self.session.exec(select(MCPServer.id).where(MCPServer.id.in_(server_ids))).all()
         
-        if existing_connection:
-            # Update existing connection
-            existing_connection.is_connected = True
-            existing_connection.connection_config = config
-            existing_connection.connected_at = current_time
-            existing_connection.last_used = current_time
-            self.session.add(existing_connection)
-            self.session.commit()
-            self.session.refresh(existing_connection)
-            return existing_connection
-        else:
-            # Create new connection
-            connection = UserMCPConnection(
-                user_id=user_id,
-                server_id=server_id,
-                is_connected=True,
-                connection_config=config,
-                connected_at=current_time,
-                last_used=current_time
-            )
-            self.session.add(connection)
-            self.session.commit()
-            self.session.refresh(connection)
-            return connection
+        connection_ids = {}
+        if known_ids:
+            current_time = datetime.utcnow()
+            statement = insert(UserMCPConnection).values([
+                {
+                    "user_id": user_id,
+                    "server_id": server_id,
+                    "is_connected": True,
+                    "connection_config": configs[server_id],
+                    "connected_at": current_time,
+                    "last_used": current_time
+                }
+                for server_id in known_ids
+            ])
+            statement = statement.on_conflict_do_update(
+                index_elements=[UserMCPConnection.user_id, UserMCPConnection.server_id],
+                set_={
+                    "is_connected": True,
+                    "connection_config": statement.excluded.connection_config,
+                    "connected_at": statement.excluded.connected_at,
+                    "last_used": statement.excluded.last_used
+                }
+            ).returning(UserMCPConnection.server_id, UserMCPConnection.id)
+            connection_ids = dict(self.session.execute(statement).all())
+        self.session.commit()
+        return {server_id: connection_ids.get(server_id) for server_id in server_ids}
     
-    def disconnect_user_from_server(self, user_id: str, server_id: int) -> bool:
-        """Disconnect user from MCP server"""
-        statement = select(UserMCPConnection).where(
+    def disconnect_user_from_servers(self, user_id: str, server_ids: List[int]) -> Dict[int, bool]:
+        """Disconnect user from several MCP servers in one transaction"""
+        statement = update(UserMCPConnection).where(
             and_(
                 UserMCPConnection.user_id == user_id,
-                UserMCPConnection.server_id == server_id
+                UserMCPConnection.server_id.in_(server_ids)
             )
-        )
-        connection = self.session.exec(statement).first()
-        
-        if connection:
-            connection.is_connected = False
-            self.session.add(connection)
-            self.session.commit()
-            return True
-        return False
+        ).values(is_connected=False).returning(UserMCPConnection.server_id).execution_options(synchronize_session=False)
+        found = set(self.session.execute(statement).scalars())
+        self.session.commit()
+        return {server_id: server_id in found for server_id in server_ids}
     
     def update_connection_config(self, user_id: str, server_id: int, config: Dict) -> bool:
         """Update connection configuration"""
-        statement = select(UserMCPConnection).where(
+        statement = update(UserMCPConnection).where(
             and_(
                 UserMCPConnection.user_id == user_id,
                 UserMCPConnection.server_id == server_id
             )
-        )
-        connection = self.session.exec(statement).first()
-        
-        if connection:
-            connection.connection_config = config
-            connection.last_used = datetime.utcnow()
-            self.session.add(connection)
-            self.session.commit()
-            return True
-        return False
+        ).values(
+            connection_config=config,
+            last_used=datetime.utcnow()
+        ).execution_options(synchronize_session=False)
+        result = self.session.execute(statement)
+        self.session.commit()
+        return result.rowcount > 0
     
     def get_server_by_id(self, server_id: int) -> Optional[MCPServer]:
         """Get server by ID"""
@@ -379,19 +496,117 @@ def get_current_userid() -> str:
 
 app = FastAPI(title="MCP Server Management API")
 
-# Database setup
+# Endpoints are plain `def`: the Session below is synchronous, so FastAPI runs
+# them in its worker thread pool instead of blocking the event loop. The pool
+# is capped at DB_THREADS, which should not exceed the engine's connection pool.
+DB_THREADS = int(os.environ.get("DB_THREADS", 15))
+
+# Upper bound on servers per batch connect/disconnect request
+MAX_BATCH_SIZE = 100
+
+# Default and largest page for the list endpoints
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Database setup (pragmas and pool size come from the $DB_PROFILE profile)
 DATABASE_URL = "sqlite:///app.db"
-engine = create_engine(DATABASE_URL)
+engine = create_tuned_engine(DATABASE_URL)
+
+# Schema history, applied in order by create_db_and_tables; append, never edit.
+# Version 1 is the schema create_all made before migrations existed, frozen as
+# DDL so every database starts from the same tables whenever it was created.
+MIGRATIONS = [
+    Migration(1, "initial tables", [
+        """CREATE TABLE IF NOT EXISTS "user" (
+            user_id VARCHAR NOT NULL,
+            email VARCHAR NOT NULL,
+            name VARCHAR NOT NULL,
+            id INTEGER NOT NULL,
+            created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+            PRIMARY KEY (id)
+        )""",
+        'CREATE UNIQUE INDEX IF NOT EXISTS ix_user_user_id ON "user" (user_id)',
+        """CREATE TABLE IF NOT EXISTS mcpserver (
+            name VARCHAR NOT NULL,
+            server_id VARCHAR NOT NULL,
+            config JSON,
+            is_active BOOLEAN NOT NULL,
+            id INTEGER NOT NULL,
+            created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+            PRIMARY KEY (id)
+        )""",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_mcpserver_server_id ON mcpserver (server_id)",
+        """CREATE TABLE IF NOT EXISTS usermcpconnection (
+            user_id VARCHAR NOT NULL,
+            server_id INTEGER NOT NULL,
+            is_connected BOOLEAN NOT NULL,
+            connection_config JSON,
+            connected_at DATETIME,
+            last_used DATETIME,
+            id INTEGER NOT NULL,
+            created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+            PRIMARY KEY (id),
+            FOREIGN KEY(user_id) REFERENCES "user" (user_id),
+            FOREIGN KEY(server_id) REFERENCES mcpserver (id)
+        )""",
+    ]),
+    # One row per (user, server): the conflict target of the connect upserts
+    Migration(2, "unique (user_id, server_id) on connections", [
+        # keep the newest row of any duplicated pair
+        "DELETE FROM usermcpconnection WHERE id NOT IN "
+        "(SELECT MAX(id) FROM usermcpconnection GROUP BY user_id, server_id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_usermcpconnection_user_server "
+        "ON usermcpconnection (user_id, server_id)",
+    ]),
+    # Connected rows only: serves /api/my-connections?is_connected=true pages
+    Migration(3, "partial index on connected rows", [
+        "CREATE INDEX IF NOT EXISTS ix_usermcpconnection_connected "
+        "ON usermcpconnection (user_id, server_id) WHERE is_connected = 1",
+    ]),
+]
 
 def create_db_and_tables():
-    """Create database tables"""
-    SQLModel.metadata.create_all(engine)
+    """Bring the database schema up to the latest migration"""
+    with engine.begin() as connection:
+        migrate(connection, MIGRATIONS)
 
 def get_session():
     """Database session dependency"""
-    with Session(engine) as session:
+    with Session(engine, expire_on_commit=False) as session:
         yield session
 
+class KnownUserCache:
+    """LRU set of user_ids known to exist in the database, each trusted for ttl seconds"""
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._expires: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __contains__(self, user_id: str) -> bool:
+        with self._lock:
+            expires = self._expires.get(user_id)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._expires[user_id]
+                return False
+            self._expires.move_to_end(user_id)
+            return True
+    
+    def add(self, user_id: str):
+        with self._lock:
+            self._expires[user_id] = time.monotonic() + self.ttl
+            self._expires.move_to_end(user_id)
+            while len(self._expires) > self.maxsize:
+                self._expires.popitem(last=False)
+    
+    def discard(self, user_id: str):
+        with self._lock:
+            self._expires.pop(user_id, None)
+
+known_users = KnownUserCache()
+
 def ensure_user_exists(user_id: str, session: Session) -> User:
     """Ensure user exists in database, create if not"""
     db_ops = MCPDatabaseOperations(session)
@@ -403,7 +618,8 @@ def ensure_user_exists(user_id: str, session: Session) -> User:
         name=user_id  # Use user_id as name for now
     )
     
-    return db_ops.create_or_update_user(user_create)
+    # Never overwrites a profile another request stored in the meantime
+    return db_ops.get_or_create_user(user_create)
 
 def get_db_user(user_id: str, session: Session) -> User:
     """Get user from database, create if doesn't exist"""
@@ -414,11 +630,25 @@ def get_db_user(user_id: str, session: Session) -> User:
         # Auto-create user if they don't exist
         db_user = ensure_user_exists(user_id, session)
     
+    known_users.add(user_id)
     return db_user
 
+def ensure_user(user_id: str, session: Session):
+    """Make sure the user row exists; no query at all for recently seen users"""
+    if user_id not in known_users:
+        get_db_user(user_id, session)
+
+# Version of the active servers, kept to answer polls with 304s (the rows are
+# not kept: every page is read with the user's status in one JOIN, and a
+# count/highest-id fingerprint notices servers added by other processes);
+# create_mcp_server invalidates it and connect/disconnect touch the user so
+# their ETag changes too
+catalog = CatalogCache(ttl=float(os.environ.get("CATALOG_TTL", 30)))
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize database and sample data"""
+    to_thread.current_default_thread_limiter().total_tokens = DB_THREADS
     create_db_and_tables()
     
     # Create sample servers
@@ -427,21 +657,41 @@ async def startup_event():
         db_ops.initialize_sample_servers()
 
 @app.get("/api/mcp-servers")
-async def get_mcp_servers(
+def get_mcp_servers(
+    request: Request,
+    response: Response,
+    after: Optional[int] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    is_connected: Optional[bool] = None,
     session: Session = Depends(get_session),
     user_id: str = Depends(get_current_userid)
 ):
-    """Get all available MCP servers with user connection status"""
+    """Get available MCP servers with user connection status, a page at a time"""
+    # Polling clients that already have the current list get a 304 without a query
+    etag = catalog.etag(user_id)
+    if catalog.fresh() and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
     # Ensure user exists in database
-    get_db_user(user_id, session)
+    ensure_user(user_id, session)
     
     db_ops = MCPDatabaseOperations(session)
-    servers = db_ops.get_servers_with_user_status(user_id)
-    
-    return MCPServerListResponse(servers=servers)
+    if not catalog.fresh():
+        version = catalog.version
+        catalog.stamp(version, db_ops.get_catalog_fingerprint())
+    
+    # One JOIN gives the page and the user's status together; one extra row
+    # tells whether there is a next page
+    servers = db_ops.get_servers_with_user_status(user_id, after=after, limit=limit + 1, is_connected=is_connected)
+    
+    response.headers["ETag"] = etag
+    return MCPServerListResponse(
+        servers=servers[:limit],
+        next_after=servers[limit - 1].id if len(servers) > limit else None
+    )
 
 @app.post("/api/connect-mcp-server/{server_id}")
-async def connect_to_mcp_server(
+def connect_to_mcp_server(
     server_id: int,
     connection_data: Optional[UserMCPConnectionCreate] = None,
     session: Session = Depends(get_session),
@@ -450,7 +700,7 @@ async def connect_to_mcp_server(
     """Connect user to an MCP server"""
     try:
         # Ensure user exists in database
-        get_db_user(user_id, session)
+        ensure_user(user_id, session)
         
         db_ops = MCPDatabaseOperations(session)
         
@@ -466,6 +716,7 @@ async def connect_to_mcp_server(
             server_id=server_id,
             config=config
         )
+        catalog.touch_user(user_id)
         
         return ConnectionResponse(
             message="Successfully connected to MCP server",
@@ -477,20 +728,21 @@ async def connect_to_mcp_server(
         raise HTTPException(status_code=500, detail=f"Error connecting to MCP server: {str(e)}")
 
 @app.post("/api/disconnect-mcp-server/{server_id}")
-async def disconnect_from_mcp_server(
+def disconnect_from_mcp_server(
     server_id: int,
     session: Session = Depends(get_session),
     user_id: str = Depends(get_current_userid)
 ):
     """Disconnect user from an MCP server"""
     # Ensure user exists in database
-    get_db_user(user_id, session)
+    ensure_user(user_id, session)
     
     db_ops = MCPDatabaseOperations(session)
     success = db_ops.disconnect_user_from_server(
         user_id=user_id,
         server_id=server_id
     )
+    catalog.touch_user(user_id)
     
     if success:
         return ConnectionResponse(
@@ -500,22 +752,77 @@ async def disconnect_from_mcp_server(
     else:
         raise HTTPException(status_code=404, detail="Connection not found")
 
+@app.post("/api/connect-mcp-servers")
+def connect_to_mcp_servers(
+    batch: BatchConnectRequest,
+    session: Session = Depends(get_session),
+    user_id: str = Depends(get_current_userid)
+):
+    """Connect user to several MCP servers in a single transaction"""
+    if len(batch.servers) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} servers per batch")
+    
+    # Ensure user exists in database
+    ensure_user(user_id, session)
+    
+    # A server listed twice keeps its last config
+    configs = {item.server_id: item.connection_config for item in batch.servers}
+    db_ops = MCPDatabaseOperations(session)
+    connection_ids = db_ops.connect_user_to_servers(user_id, configs)
+    catalog.touch_user(user_id)
+    
+    return BatchConnectionResponse(results=[
+        BatchItemResult(server_id=server_id, success=True, connection_id=connection_id)
+        if connection_id is not None else
+        BatchItemResult(server_id=server_id, success=False, detail="MCP server not found")
+        for server_id, connection_id in connection_ids.items()
+    ])
+
+@app.post("/api/disconnect-mcp-servers")
+def disconnect_from_mcp_servers(
+    batch: BatchDisconnectRequest,
+    session: Session = Depends(get_session),
+    user_id: str = Depends(get_current_userid)
+):
+    """Disconnect user from several MCP servers in a single transaction"""
+    if len(batch.server_ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} servers per batch")
+    
+    # Ensure user exists in database
+    ensure_user(user_id, session)
+    
+    db_ops = MCPDatabaseOperations(session)
+    results = db_ops.disconnect_user_from_servers(user_id, list(dict.fromkeys(batch.server_ids)))
+    catalog.touch_user(user_id)
+    
+    return BatchConnectionResponse(results=[
+        BatchItemResult(server_id=server_id, success=success, detail=None if success else "Connection not found")
+        for server_id, success in results.items()
+    ])
+
 @app.get("/api/my-connections")
-async def get_my_connections(
+def get_my_connections(
+    after: Optional[int] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    is_connected: Optional[bool] = None,
     session: Session = Depends(get_session),
     user_id: str = Depends(get_current_userid)
 ):
-    """Get user's MCP server connections"""
+    """Get user's MCP server connections, a page at a time"""
     # Ensure user exists in database
-    get_db_user(user_id, session)
+    ensure_user(user_id, session)
     
     db_ops = MCPDatabaseOperations(session)
-    connections = db_ops.get_user_connections(user_id)
+    # One extra row tells whether there is a next page
+    connections = db_ops.get_user_connections(user_id, after=after, limit=limit + 1, is_connected=is_connected)
     
-    return UserConnectionsResponse(connections=connections)
+    return UserConnectionsResponse(
+        connections=connections[:limit],
+        next_after=connections[limit - 1].server_id if len(connections) > limit else None
+    )
 
 @app.put("/api/update-connection-config/{server_id}")
-async def update_connection_config(
+def update_connection_config(
     server_id: int,
     config: Dict,
     session: Session = Depends(get_session),
@@ -523,7 +830,7 @@ async def update_connection_config(
 ):
     """Update connection configuration for a specific MCP server"""
     # Ensure user exists in database
-    get_db_user(user_id, session)
+    ensure_user(user_id, session)
     
     db_ops = MCPDatabaseOperations(session)
     success = db_ops.update_connection_config(
@@ -538,7 +845,7 @@ async def update_connection_config(
         raise HTTPException(status_code=404, detail="Connection not found")
 
 @app.put("/api/update-profile")
-async def update_user_profile(
+def update_user_profile(
     profile_data: UserCreate,
     session: Session = Depends(get_session),
     user_id: str = Depends(get_current_userid)
@@ -548,19 +855,20 @@ async def update_user_profile(
     
     # Update the user profile
     profile_data.user_id = user_id  # Ensure user_id matches
+    known_users.discard(user_id)
     updated_user = db_ops.create_or_update_user(profile_data)
     
     return {"message": "Profile updated successfully", "user": updated_user}
 
 @app.get("/api/server-details/{server_id}")
-async def get_server_details(
+def get_server_details(
     server_id: int,
     session: Session = Depends(get_session),
     user_id: str = Depends(get_current_userid)
 ):
     """Get detailed information about a specific MCP server"""
     # Ensure user exists in database
-    get_db_user(user_id, session)
+    ensure_user(user_id, session)
     
     db_ops = MCPDatabaseOperations(session)
     server = db_ops.get_server_by_id(server_id)
@@ -571,20 +879,26 @@ async def get_server_details(
     return MCPServerRead(**server.dict())
 
 @app.post("/api/create-mcp-server")
-async def create_mcp_server(
+def create_mcp_server(
     server_data: MCPServerCreate,
     session: Session = Depends(get_session),
     user_id: str = Depends(get_current_userid)
 ):
     """Create a new MCP server (admin functionality)"""
     # Ensure user exists in database
-    get_db_user(user_id, session)
+    ensure_user(user_id, session)
     
     db_ops = MCPDatabaseOperations(session)
     server = db_ops.create_mcp_server(server_data)
+    catalog.invalidate()
     
     return {"message": "MCP server created successfully", "server": server}
 
+@app.get("/api/db-pool-stats")
+def get_db_pool_stats():
+    """Connection pool checkout wait time and utilization"""
+    return pool_stats(engine)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,23 +1,29 @@
 # async_simplified_app.py - Async version with AsyncSession
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+import os
 import uuid
 from sqlmodel import SQLModel, Field, select, JSON, Column
 from sqlalchemy import DateTime, func
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from fastapi import FastAPI, HTTPException, Depends
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession  # adds .exec() to SQLAlchemy's AsyncSession
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
+from db_engine import create_tuned_async_engine, pool_stats
+from catalog_cache import CatalogCache, etag_matches
+from migrations import Migration, migrate
 
 # ==================== MODELS (same as before) ====================
 
 class MCPServer(SQLModel, table=True):
+    # Indexes come from MIGRATIONS below, not from the model
     server_id: str = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
-    name: str = Field(index=True)
+    name: str
     server_type: str
     description: Optional[str] = None
     base_config: Dict[str, Any] = Field(sa_column=Column(JSON))
     is_active: bool = Field(default=True)
-    user_id: Optional[str] = Field(default=None, index=True)
-    is_connected: bool = Field(default=False, index=True)
+    user_id: Optional[str] = None
+    is_connected: bool = False
     user_config: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(JSON))
     created_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime(timezone=True), server_default=func.now()))
     connected_at: Optional[datetime] = None
@@ -63,6 +69,7 @@ class AvailableServerRead(SQLModel):
 
 class MCPServerListResponse(SQLModel):
     servers: List[MCPServerRead]
+    next_after: Optional[str] = None  # pass as ?after= for the next page
 
 class AvailableServerListResponse(SQLModel):
     servers: List[AvailableServerRead]
@@ -102,20 +109,36 @@ class AsyncMCPDatabaseOperations:
         result = await self.session.exec(statement)
         return result.all()
     
-    async def get_user_servers(self, user_id: str) -> List[MCPServer]:
-        """Get all servers connected to a specific user"""
-        statement = select(MCPServer).where(MCPServer.user_id == user_id)
+    async def get_user_servers(
+        self,
+        user_id: str,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+        is_connected: Optional[bool] = None,
+        server_type: Optional[str] = None,
+        is_active: Optional[bool] = None
+    ) -> List[MCPServer]:
+        """Get servers connected to a specific user, ordered by server_id
+        
+        Keyset pagination: pass the last server_id seen as after.
+        """
+        statement = select(MCPServer).where(MCPServer.user_id == user_id).order_by(MCPServer.server_id)
+        if after is not None:
+            statement = statement.where(MCPServer.server_id > after)
+        if is_connected is not None:
+            statement = statement.where(MCPServer.is_connected == is_connected)
+        if server_type is not None:
+            statement = statement.where(MCPServer.server_type == server_type)
+        if is_active is not None:
+            statement = statement.where(MCPServer.is_active == is_active)
+        if limit is not None:
+            statement = statement.limit(limit)
         result = await self.session.exec(statement)
         return result.all()
     
-    async def get_connected_servers(self, user_id: str) -> List[MCPServer]:
+    async def get_connected_servers(self, user_id: str, **filters) -> List[MCPServer]:
         """Get only connected servers for a user"""
-        statement = select(MCPServer).where(
-            MCPServer.user_id == user_id,
-            MCPServer.is_connected == True
-        )
-        result = await self.session.exec(statement)
-        return result.all()
+        return await self.get_user_servers(user_id, is_connected=True, **filters)
     
     async def get_server_by_id(self, server_id: str) -> Optional[MCPServer]:
         """Get server by ID"""
@@ -276,19 +299,68 @@ app = FastAPI(title="MCP Server Management API")
 
 # Async Database setup
 DATABASE_URL = "sqlite+aiosqlite:///mcp_servers.db"  # Note: aiosqlite for async
-async_engine = create_async_engine(DATABASE_URL)
+async_engine = create_tuned_async_engine(DATABASE_URL)  # pragmas and pool size from $DB_PROFILE
 async_session_maker = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
 
+# Schema history, applied in order by create_db_and_tables; append, never edit.
+# Version 1 is the schema create_all made before migrations existed, frozen as
+# DDL so every database starts from the same tables whenever it was created.
+MIGRATIONS = [
+    Migration(1, "initial tables", [
+        """CREATE TABLE IF NOT EXISTS mcpserver (
+            server_id VARCHAR NOT NULL,
+            name VARCHAR NOT NULL,
+            server_type VARCHAR NOT NULL,
+            description VARCHAR,
+            base_config JSON,
+            is_active BOOLEAN NOT NULL,
+            user_id VARCHAR,
+            is_connected BOOLEAN NOT NULL,
+            user_config JSON,
+            created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+            connected_at DATETIME,
+            last_used DATETIME,
+            PRIMARY KEY (server_id)
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_mcpserver_name ON mcpserver (name)",
+        "CREATE INDEX IF NOT EXISTS ix_mcpserver_user_id ON mcpserver (user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_mcpserver_is_connected ON mcpserver (is_connected)",
+    ]),
+    # A user's servers in server_id order: keyset pagination of /api/your-servers
+    Migration(2, "(user_id, server_id) index for paging a user's servers", [
+        "CREATE INDEX IF NOT EXISTS ix_mcpserver_user_server ON mcpserver (user_id, server_id)",
+    ]),
+    # Available servers are user_id IS NULL AND is_active
+    Migration(3, "(user_id, is_active) index; drop the user_id index both cover", [
+        "CREATE INDEX IF NOT EXISTS ix_mcpserver_user_active ON mcpserver (user_id, is_active)",
+        "DROP INDEX IF EXISTS ix_mcpserver_user_id",
+    ]),
+]
+
 async def create_db_and_tables():
-    """Create database tables"""
+    """Bring the database schema up to the latest migration"""
     async with async_engine.begin() as conn:
-        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.run_sync(migrate, MIGRATIONS)
 
 async def get_session():
     """Async database session dependency"""
     async with async_session_maker() as session:
         yield session
 
+# Default and largest page for the list endpoints
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def server_page(servers: List[MCPServer], limit: int) -> MCPServerListResponse:
+    """Response for a page fetched with limit + 1 rows"""
+    return MCPServerListResponse(
+        servers=servers[:limit],
+        next_after=servers[limit - 1].server_id if len(servers) > limit else None
+    )
+
+# Servers open for connection; admin writes and first-time connects invalidate it
+catalog = CatalogCache(ttl=float(os.environ.get("CATALOG_TTL", 30)))
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize database and sample servers"""
@@ -303,40 +375,66 @@ async def startup_event():
 
 @app.get("/api/available-servers")
 async def get_available_servers(
+    request: Request,
+    response: Response,
     session: AsyncSession = Depends(get_session)
 ):
     """Get all available servers that can be connected to"""
-    db_ops = AsyncMCPDatabaseOperations(session)
-    servers = await db_ops.get_available_servers()
+    # Polling clients that already have the current list get a 304 without a query
+    etag = catalog.etag()
+    available_servers = catalog.servers()
+    if available_servers is not None and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
     
-    available_servers = [
-        AvailableServerRead(**server.dict()) 
-        for server in servers
-    ]
+    if available_servers is None:
+        version = catalog.version
+        db_ops = AsyncMCPDatabaseOperations(session)
+        servers = await db_ops.get_available_servers()
+        available_servers = catalog.store(version, [
+            AvailableServerRead(**server.dict()).dict()
+            for server in servers
+        ])
     
+    response.headers["ETag"] = etag
     return AvailableServerListResponse(servers=available_servers)
 
 @app.get("/api/your-servers")
 async def get_your_servers(
+    after: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    is_connected: Optional[bool] = None,
+    server_type: Optional[str] = None,
+    is_active: Optional[bool] = None,
     session: AsyncSession = Depends(get_session),
     user_id: str = Depends(get_current_userid)
 ):
-    """Get all servers this user has ever connected to"""
+    """Get all servers this user has ever connected to, a page at a time"""
     db_ops = AsyncMCPDatabaseOperations(session)
-    servers = await db_ops.get_user_servers(user_id)
+    # One extra row tells whether there is a next page
+    servers = await db_ops.get_user_servers(
+        user_id, after=after, limit=limit + 1,
+        is_connected=is_connected, server_type=server_type, is_active=is_active
+    )
     
-    return MCPServerListResponse(servers=servers)
+    return server_page(servers, limit)
 
 @app.get("/api/connected-servers")
 async def get_connected_servers(
+    after: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    server_type: Optional[str] = None,
+    is_active: Optional[bool] = None,
     session: AsyncSession = Depends(get_session),
     user_id: str = Depends(get_current_userid)
 ):
-    """Get servers this user is currently connected to"""
+    """Get servers this user is currently connected to, a page at a time"""
     db_ops = AsyncMCPDatabaseOperations(session)
-    servers = await db_ops.get_connected_servers(user_id)
+    servers = await db_ops.get_connected_servers(
+        user_id, after=after, limit=limit + 1,
+        server_type=server_type, is_active=is_active
+    )
     
-    return MCPServerListResponse(servers=servers)
+    return server_page(servers, limit)
 
 @app.post("/api/connect-server/{server_id}")
 async def connect_server(
@@ -366,6 +464,7 @@ async def connect_server(
     success = await db_ops.connect_server(server_id, user_id, user_config)
     
     if success:
+        catalog.invalidate()  # no longer available to others
         return ConnectionResponse(
             message="Successfully connected to server",
             server_id=server_id
@@ -438,6 +537,7 @@ async def create_server(
     """Create a new MCP server (admin function)"""
     db_ops = AsyncMCPDatabaseOperations(session)
     server = await db_ops.create_server(server_data)
+    catalog.invalidate()
     
     return {
         "message": "Server created successfully",
@@ -456,6 +556,7 @@ async def update_server(
     
     if not server:
         raise HTTPException(status_code=404, detail="Server not found")
+    catalog.invalidate()
     
     return {
         "message": "Server updated successfully",
@@ -472,10 +573,16 @@ async def delete_server(
     success = await db_ops.delete_server(server_id)
     
     if success:
+        catalog.invalidate()
         return {"message": "Server deleted successfully"}
     else:
         raise HTTPException(status_code=404, detail="Server not found")
 
+@app.get("/api/admin/db-pool")
+async def get_db_pool_stats():
+    """Connection pool checkout wait time and utilization (admin function)"""
+    return pool_stats(async_engine)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
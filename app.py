@@ -1,26 +1,425 @@
-from flask import Flask, redirect, request, render_template, url_for, Response
+from flask import Flask, redirect, request, render_template, url_for, Response, abort, stream_with_context, jsonify, g
 from classes.user import User
+from classes.user_store import UserStore, DuplicateUserError
+from classes.user_backend import SQLiteUserBackend
+from classes.user_import import import_format, iter_records
+from classes.row_cache import RowCache
+from classes.assets import AssetPipeline, CACHE_CONTROL
+from classes.metrics import RequestMetrics
+from classes.user_json import serializer, parse_fields, json_string
+from classes.user_search import UserSearchIndex
+from classes.broadcaster import Broadcaster
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import itertools
+import logging
+import os
+import queue
+import time
 import uuid
 
-users = []
+# path of the SQLite user database; set USER_DB="" to keep users in memory only
+USER_DB = os.environ.get("USER_DB", "users.db")
+
+users = UserStore(SQLiteUserBackend(USER_DB) if USER_DB else None)
+if users.backend is not None:
+    users.load()
+    atexit.register(users.backend.close)
 
 app = Flask(__name__)
 
+# request logging goes through a queue so a slow stdout never blocks a request
+log_handler = QueueHandler(queue.SimpleQueue())
+logger = logging.getLogger("webapp")
+logger.addHandler(log_handler)
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+
+def start_log_listener():
+    """Start a listener thread draining a fresh log queue into stderr."""
+    global log_listener
+    log_handler.queue = queue.SimpleQueue()
+    log_listener = QueueListener(log_handler.queue, logging.StreamHandler())
+    log_listener.start()
+
+
+start_log_listener()
+# looks the listener up at exit: a forked worker has replaced it by then
+atexit.register(lambda: log_listener.stop())
+
+metrics = RequestMetrics()
+
+# hashed, precompressed copies of static/, built once at startup
+assets = AssetPipeline(app.static_folder).build()
+
+
+def asset_url(name):
+    return url_for("asset", filename=assets.hashed_name(name))
+
+
+app.jinja_env.globals["asset_url"] = asset_url
+
 title = "Python Web Page - Web Site"
 
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# number of template chunks jinja collects before each flush in stream mode
+STREAM_BUFFER = 64
+IMPORT_BATCH = 1000
+# rejected rows reported back in detail; the rest are only counted
+IMPORT_MAX_ERRORS = 100
+# NDJSON lines joined into each chunk written to the client
+NDJSON_BATCH = 1000
+# seconds an SSE request may wait for news before closing; keep 0 on thread
+# workers so idle browsers hold no thread, raise it on async (gevent) workers
+SSE_HOLD = float(os.environ.get("SSE_HOLD", 0))
+# how soon browsers reconnect to /users/events after a response closes
+SSE_RETRY_MS = 2000
+# store versions are per process, so ETags carry a per-process prefix too
+ETAG_PREFIX = uuid.uuid4().hex[:8]
+RENDER_CACHE_SIZE = 32
+
+# rendered index pages keyed by ETag; cleared whenever this process changes users
+render_cache = {}
+
+
+def render_user_row(user):
+    return app.jinja_env.get_template("_user_row.html").module.user_row(user)
+
+
+# one rendered <tr> per user, dropped by the store when that user changes
+row_cache = RowCache(render_user_row)
+users.subscribe(row_cache)
+
+search_index = UserSearchIndex()
+for existing_user in users:
+    search_index.add(existing_user)
+users.subscribe(search_index)
+
+broadcaster = Broadcaster()
+
+
+def publish_user_event(event, user):
+    if event == "remove":
+        broadcaster.publish("remove", '{"id":%s}' % json_string(user.id))
+    else:
+        broadcaster.publish("user", serializer()(user))
+
+
+users.subscribe(publish_user_event)
+
+
+def after_fork():
+    """Restart background threads in a worker forked from a preloaded app."""
+    global ETAG_PREFIX
+    # the parent's listener thread did not survive fork() and cannot be restarted
+    start_log_listener()
+    # workers forked from one master would otherwise share the master's prefix
+    ETAG_PREFIX = uuid.uuid4().hex[:8]
+    if users.backend is not None:
+        users.backend.after_fork()
+
+
+@app.before_request
+def start_request():
+    g.started = time.perf_counter()
+    metrics.started()
+
+
+@app.after_request
+def measure_response(response):
+    g.status = response.status_code
+    g.response_size = response.content_length
+    return response
+
+
+@app.teardown_request
+def finish_request(error=None):
+    # streamed responses run teardown again when the stream closes; count them once
+    started = g.pop("started", None)
+    if started is None:
+        return
+    seconds = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    status = g.get("status", 500)
+    metrics.finished(request.method, route, status, seconds, request.content_length or 0, g.get("response_size"))
+    logger.info("%s %s %s %.1fms", request.method, request.full_path.rstrip("?"), status, seconds * 1000)
+
+
+@app.before_request
+def sync_users():
+    users.sync()
+
+
+def page_of_users(after, limit):
+    """Return (page, next_after) for the users that follow the ``after`` id."""
+    try:
+        return users.page(after, limit)
+    except KeyError:
+        abort(400, "unknown cursor")
+
+
+def user_to_dict(user):
+    return {"id": user.id, "name": user.name, "email": user.email, "address": user.address}
+
+
+def index_etag(after, limit, view):
+    return f"{ETAG_PREFIX}-{users.version}-{view}-{after or ''}-{limit}"
+
+
+def is_not_modified(etag):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since:
+        return request.if_modified_since.timestamp() >= int(users.last_modified)
+    return False
+
+
+def cached_render(etag, template_name, **context):
+    body = render_cache.get(etag)
+    if body is None:
+        if len(render_cache) >= RENDER_CACHE_SIZE:
+            render_cache.clear()
+        body = render_cache[etag] = render_template(template_name, **context)
+    return body
+
+
+def stream_template(template_name, **context):
+    """Render ``template_name`` as a response that is flushed while it renders."""
+    app.update_template_context(context)
+    stream = app.jinja_env.get_template(template_name).stream(context)
+    stream.enable_buffering(STREAM_BUFFER)
+    return Response(stream_with_context(stream))
+
 
 @app.route('/', methods=["GET", "POST"])
 def hello_world():
     if request.method == "POST":
-        std_id = request.form.get("id")
+        std_id = request.form.get("id") or str(uuid.uuid4())
         name = request.form.get("name")
         email = request.form.get("email")
         address = request.form.get("addr")
-        user = User(std_id, name, address, email)
-        users.append(user)
+        if users.exists(std_id) or (email and users.email_exists(email)):
+            abort(409, "user id or email already exists")
+        try:
+            users.add(User(std_id, name, address, email))
+        except DuplicateUserError as e:
+            abort(409, str(e))
+        render_cache.clear()
         redirect(url_for("hello_world"))
-    print(request)
-    return render_template("index.html", title=title, users=users, id=uuid.uuid4())
+    after = request.args.get("after")
+    limit = min(max(request.args.get("limit", PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    stream = request.args.get("stream", "0") == "1"
+    # the virtual view renders an empty table that fetches rows as it scrolls
+    view = "virtual" if request.args.get("view") == "virtual" else "table"
+    etag = index_etag(after, limit, view)
+    if request.method == "GET" and is_not_modified(etag):
+        response = Response(status=304)
+    else:
+        page, next_after = page_of_users(after, limit) if view == "table" else ([], None)
+        context = dict(title=title, rows=row_cache.rows(page), after=after, next_after=next_after, limit=limit,
+                       stream=stream, events_cursor=broadcaster.cursor, view=view)
+        if stream:
+            response = stream_template("index.html", **context)
+        else:
+            response = Response(cached_render(etag, "index.html", **context))
+    if request.method == "GET":
+        response.set_etag(etag)
+        response.last_modified = int(users.last_modified)
+        response.cache_control.no_cache = True
+    return response
+
+
+@app.route('/users/search')
+def search_users():
+    serialize = serializer(query_fields())
+    limit = min(max(request.args.get("limit", PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    found = [users.get(user_id) for user_id in search_index.search(request.args.get("q", ""), limit)]
+    body = '{"users":[%s]}' % ",".join(serialize(user) for user in found if user is not None)
+    return Response(body, mimetype="application/json")
+
+
+@app.route('/users/<user_id>', methods=["GET"])
+def get_user(user_id):
+    user = users.get(user_id)
+    if user is None:
+        abort(404)
+    return jsonify(user_to_dict(user))
+
+
+@app.route('/users/<user_id>', methods=["PUT"])
+def update_user(user_id):
+    data = request.get_json(silent=True) or request.form
+    if not isinstance(data, dict):
+        abort(400, "expected a json object")
+    user = users.get(user_id)
+    if user is None:
+        abort(404)
+    values = [data.get("name", user.name), data.get("address", data.get("addr", user.address)),
+              data.get("email", user.email)]
+    if not all(value is None or isinstance(value, str) for value in values):
+        abort(400, "fields must be strings")
+    try:
+        users.update(user_id, *values)
+    except DuplicateUserError as e:
+        abort(409, str(e))
+    render_cache.clear()
+    return jsonify(user_to_dict(user))
+
+
+@app.route('/users/<user_id>', methods=["DELETE"])
+def delete_user(user_id):
+    user = users.remove(user_id)
+    if user is None:
+        abort(404)
+    render_cache.clear()
+    return jsonify(user_to_dict(user))
+
+
+def add_import_batch(batch, report):
+    for number, user in batch:
+        try:
+            users.add(user)
+            report["accepted"] += 1
+        except DuplicateUserError as e:
+            reject(report, number, str(e))
+
+
+def reject(report, number, error):
+    report["rejected"] += 1
+    if len(report["errors"]) < IMPORT_MAX_ERRORS:
+        report["errors"].append({"row": number, "error": error})
+
+
+@app.route('/users/import', methods=["POST"])
+def import_users():
+    fmt = import_format(request.mimetype)
+    if fmt is None:
+        abort(415, "send text/csv or application/jsonl")
+    report = {"accepted": 0, "rejected": 0, "errors": []}
+    started = time.perf_counter()
+    batch = []
+    for number, record, error in iter_records(request.stream, fmt):
+        if error is not None:
+            reject(report, number, error)
+            continue
+        values = [record.get(field) for field in ("id", "name", "address", "email")]
+        if not all(value is None or isinstance(value, str) for value in values):
+            reject(report, number, "fields must be strings")
+            continue
+        batch.append((number, User(values[0] or str(uuid.uuid4()), *values[1:])))
+        if len(batch) >= IMPORT_BATCH:
+            add_import_batch(batch, report)
+            batch = []
+    add_import_batch(batch, report)
+    render_cache.clear()
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    report["rows_per_second"] = round((report["accepted"] + report["rejected"]) / max(report["seconds"], 1e-3))
+    return jsonify(report)
+
+
+def query_fields():
+    try:
+        return parse_fields(request.args.get("fields"))
+    except ValueError as e:
+        abort(400, str(e))
+
+
+def ndjson_lines(found, serialize):
+    batch = []
+    for user in found:
+        batch.append(serialize(user))
+        if len(batch) >= NDJSON_BATCH:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+
+@app.route('/api/users', methods=["GET"])
+def api_list_users():
+    serialize = serializer(query_fields())
+    after = request.args.get("after")
+    mimetype = request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"],
+                                                   default="application/json")
+    if mimetype == "application/x-ndjson":
+        try:
+            found = users.iter_after(after)
+        except KeyError:
+            abort(400, "unknown cursor")
+        limit = request.args.get("limit", type=int)
+        if limit is not None:
+            found = itertools.islice(found, max(limit, 0))
+        return Response(stream_with_context(ndjson_lines(found, serialize)), mimetype=mimetype)
+    limit = min(max(request.args.get("limit", PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    page, next_after = page_of_users(after, limit)
+    body = '{"users":[%s],"next_after":%s}' % (",".join(map(serialize, page)), json_string(next_after))
+    return Response(body, mimetype=mimetype)
+
+
+@app.route('/api/users/range')
+def api_user_range():
+    serialize = serializer(query_fields())
+    start = max(request.args.get("start", 0, type=int), 0)
+    count = min(max(request.args.get("count", PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    found = users.range(start, start + count)
+    body = '{"total":%d,"start":%d,"users":[%s]}' % (len(users), start, ",".join(map(serialize, found)))
+    return Response(body, mimetype="application/json")
+
+
+@app.route('/api/users', methods=["POST"])
+def api_create_user():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        abort(400, "expected a json object")
+    values = [data.get(field) for field in ("id", "name", "address", "email")]
+    if not all(value is None or isinstance(value, str) for value in values):
+        abort(400, "fields must be strings")
+    try:
+        user = users.add(User(values[0] or str(uuid.uuid4()), *values[1:]))
+    except DuplicateUserError as e:
+        abort(409, str(e))
+    render_cache.clear()
+    response = Response(serializer()(user), status=201, mimetype="application/json")
+    response.headers["Location"] = url_for("get_user", user_id=user.id)
+    return response
+
+
+@app.route('/users/events')
+def user_events():
+    cursor = request.headers.get("Last-Event-ID") or request.args.get("after")
+    events, head, reset = broadcaster.read(cursor, SSE_HOLD)
+    lines = [f"retry: {SSE_RETRY_MS}\n\n"]
+    if reset:
+        lines.append(f"id: {head}\nevent: reset\ndata: {{}}\n\n")
+    else:
+        lines += [f"id: {event_id}\nevent: {event}\ndata: {data}\n\n" for event_id, event, data in events]
+        # an id-only message moves the browser's Last-Event-ID even when nothing changed
+        lines.append(f"id: {head}\n\n")
+    response = Response("".join(lines), mimetype="text/event-stream")
+    response.cache_control.no_cache = True
+    return response
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/assets/<path:filename>')
+def asset(filename):
+    found = assets.find(filename, request.accept_encodings)
+    if found is None:
+        abort(404)
+    item, encoding, body = found
+    response = Response(body, mimetype=item.mimetype)
+    if encoding != "identity":
+        response.content_encoding = encoding
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    response.vary.add("Accept-Encoding")
+    response.set_etag(f"{item.digest}-{encoding}")
+    return response
 
 
 if __name__ == '__main__':
@@ -1,4 +1,7 @@
-students = []
+import weakref
+
+# weak references: tracked students are released once nothing else uses them
+students = weakref.WeakSet()
 
 
 class Student:
@@ -7,7 +10,7 @@ class Student:
     def __init__(self, name, student_id=11):
         self.name = name
         self.id = student_id
-        students.append(self)
+        students.add(self)
 
     def __str__(self) -> str:
         return f"student name : {self.name} \t Student Id : {self.id}"
@@ -38,4 +41,4 @@ print(isha.get_school_name())
 print(isha)
 print(isha.get_name_cap())
 
-print("students list :: ", students)
+print("students list :: ", list(students))
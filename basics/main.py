@@ -13,4 +13,4 @@ print(isha.get_school_name())
 print(isha)
 print(isha.get_name_cap())
 
-print("students list :: ", students)
+print("students list :: ", list(students))
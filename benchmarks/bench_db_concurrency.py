@@ -0,0 +1,87 @@
+"""Throughput of ai_stuff endpoints as concurrent clients grow: blocking vs thread pool.
+
+"before" serves the server list from an ``async def`` endpoint that runs the
+synchronous Session on the event loop (how ai_stuff.py used to work); "after"
+is the same handler as a plain ``def`` endpoint, which FastAPI runs in its
+bounded thread pool. --query-delay adds a sleep to every SQL statement to
+stand in for a database that is not on local disk. Run from the repository root:
+
+    python -m benchmarks.bench_db_concurrency --clients 1 4 16 64 --requests 1000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+from anyio import to_thread
+from fastapi import Depends, FastAPI
+from sqlalchemy import event
+from sqlmodel import Session, create_engine
+
+import ai_stuff
+from migrations import migrate
+
+
+def build_app(engine, blocking):
+    app = FastAPI()
+
+    def get_session():
+        with Session(engine) as session:
+            yield session
+
+    def list_servers(session: Session = Depends(get_session)):
+        servers = ai_stuff.MCPDatabaseOperations(session).get_servers_with_user_status("bench-user")
+        return ai_stuff.MCPServerListResponse(servers=servers)
+
+    if blocking:
+        async def blocking_list_servers(session: Session = Depends(get_session)):
+            return list_servers(session)
+        app.get("/servers")(blocking_list_servers)
+    else:
+        app.get("/servers")(list_servers)
+    return app
+
+
+async def drive(app, clients, requests):
+    to_thread.current_default_thread_limiter().total_tokens = ai_stuff.DB_THREADS
+    transport = httpx.ASGITransport(app=app)
+    remaining = iter(range(requests))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            for _ in remaining:
+                response = await client.get("/servers")
+                response.raise_for_status()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        return requests / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--query-delay", type=float, default=1.0, help="milliseconds added to every statement")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}", pool_size=ai_stuff.DB_THREADS, max_overflow=0)
+    with engine.begin() as connection:
+        migrate(connection, ai_stuff.MIGRATIONS)
+    with Session(engine) as session:
+        ai_stuff.MCPDatabaseOperations(session).initialize_sample_servers()
+    if args.query_delay:
+        @event.listens_for(engine, "before_cursor_execute")
+        def delay(*_):
+            time.sleep(args.query_delay / 1000)
+
+    print(f"{'clients':>8} {'before req/s':>14} {'after req/s':>14}")
+    for clients in args.clients:
+        before = asyncio.run(drive(build_app(engine, blocking=True), clients, args.requests))
+        after = asyncio.run(drive(build_app(engine, blocking=False), clients, args.requests))
+        print(f"{clients:>8} {before:>14.1f} {after:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Index render latency with and without the per-user row fragment cache.
+
+Renders the whole user table (not one page) after a single POST, at each
+user count. Run from the repository root:
+
+    python -m benchmarks.bench_row_render --counts 10000 100000 1000000
+"""
+import argparse
+import os
+import time
+
+os.environ["USER_DB"] = ""
+
+import app as webapp  # noqa: E402
+from classes.user import User  # noqa: E402
+
+# the table body as index.html rendered it before fragments were cached
+FULL_TABLE = """{% for user in users %}
+                    <tr data-user-id="{{user.id}}">
+                        <td>{{user.name}}</td>
+                        <td>{{user.email}}</td>
+                        <td>{{user.address}}</td>
+                        <td>
+                            <button class="btn btn-sm btn-primary">Edit</button>
+                            &nbsp;
+                            <button class="btn btn-sm btn-danger">Delete</button>
+                        </td>
+                    </tr>
+{% endfor %}"""
+
+
+def timed(render):
+    started = time.perf_counter()
+    body = render()
+    return time.perf_counter() - started, len(body)
+
+
+def run(count):
+    webapp.users = store = webapp.UserStore()
+    row_cache = webapp.RowCache(webapp.render_user_row, capacity=count + 1)
+    store.subscribe(row_cache)
+    for i in range(count):
+        store.add(User(f"user-{i}", "name%d" % (i % 5000), "%d Main Street" % (i % 1000), f"user{i}@example.com"))
+    full_table = webapp.app.jinja_env.from_string(FULL_TABLE)
+    with webapp.app.test_request_context("/"):
+        # warm the fragment cache, as earlier GETs would have
+        "".join(row_cache.rows(store))
+        store.add(User("new-user", "new", "1 New Street", "new@example.com"))
+        full, _ = timed(lambda: full_table.render(users=store))
+        cached, _ = timed(lambda: "".join(row_cache.rows(store)))
+    print(f"{count:>9} users  full render {full * 1000:9.1f} ms  fragment cache {cached * 1000:9.1f} ms"
+          f"  ({full / cached:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--counts", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+    for count in args.counts:
+        run(count)
+
+
+if __name__ == '__main__':
+    main()
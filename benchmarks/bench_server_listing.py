@@ -0,0 +1,100 @@
+"""Latency of get_servers_with_user_status: two queries + dict() vs one LEFT OUTER JOIN.
+
+"before" is the old implementation (all active servers, then the user's
+connected ids, then ``MCPServerRead(**server.dict())`` per server); "after" is
+the current single-query version. Connections are spread over --users users,
+so each user is connected to about connections / users servers. Run from the
+repository root:
+
+    python -m benchmarks.bench_server_listing --servers 10000 --connections 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import and_, insert
+from sqlmodel import Session, create_engine, select
+
+import ai_stuff
+from ai_stuff import MCPServer, MCPServerRead, User, UserMCPConnection
+from migrations import migrate
+
+
+def before(session, user_id):
+    servers = session.exec(select(MCPServer).where(MCPServer.is_active == True)).all()
+    statement = select(UserMCPConnection.server_id).where(
+        and_(
+            UserMCPConnection.user_id == user_id,
+            UserMCPConnection.is_connected == True
+        )
+    )
+    connected_server_ids = set(session.exec(statement).all())
+    return [MCPServerRead(**server.dict(), is_connected=server.id in connected_server_ids) for server in servers]
+
+
+def after(session, user_id):
+    return ai_stuff.MCPDatabaseOperations(session).get_servers_with_user_status(user_id)
+
+
+def populate(engine, servers, connections, users):
+    now = datetime.utcnow()
+    rng = random.Random(0)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"user_id": f"user-{i}", "email": f"user{i}@example.com", "name": f"user {i}", "created_at": now}
+            for i in range(users)
+        ])
+        conn.execute(insert(MCPServer), [
+            {"name": f"Server {i}", "server_id": f"server-{i}", "is_active": i % 10 != 0, "created_at": now,
+             "config": {"name": f"Server {i}", "url": f"mcp://server-{i}", "transport": "stdio"}}
+            for i in range(servers)
+        ])
+        # distinct (user, server) pairs, as connect_user_to_server keeps them
+        pairs = set()
+        while len(pairs) < connections:
+            pairs.add((rng.randrange(users), rng.randrange(servers) + 1))
+        conn.execute(insert(UserMCPConnection), [
+            {"user_id": f"user-{user}", "server_id": server, "is_connected": rng.random() < 0.8,
+             "connected_at": now, "last_used": now, "created_at": now}
+            for user, server in pairs
+        ])
+
+
+def timed(fn, engine, user_ids, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        with Session(engine) as session:
+            started = time.perf_counter()
+            for user_id in user_ids:
+                result = fn(session, user_id)
+            best = min(best, (time.perf_counter() - started) / len(user_ids))
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--servers", type=int, default=10_000)
+    parser.add_argument("--connections", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--samples", type=int, default=5, help="users listed per timing run")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    with engine.begin() as connection:
+        migrate(connection, ai_stuff.MIGRATIONS)
+    populate(engine, args.servers, args.connections, args.users)
+    user_ids = [f"user-{i}" for i in range(args.samples)]
+
+    old, old_result = timed(before, engine, user_ids, args.repeat)
+    new, new_result = timed(after, engine, user_ids, args.repeat)
+    assert sorted((s.id, s.is_connected) for s in old_result) == sorted((s.id, s.is_connected) for s in new_result)
+    print(f"{args.servers} servers, {args.connections} connections: "
+          f"before {old * 1000:.1f} ms  after {new * 1000:.1f} ms per listing  ({old / new:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Bytes per user for the slotted User against the old __dict__ layout.
+
+Names repeat across users but addresses are mostly unique, so rows are built
+with --names distinct names and --addresses distinct addresses (default: one
+per user). Each layout is also measured after its users are dropped: strings
+passed through sys.intern stay behind, the store's SharedStrings do not.
+Run from the repository root:
+
+    python -m benchmarks.bench_user_memory --count 1000000
+"""
+import argparse
+import gc
+import sys
+import tracemalloc
+
+from classes import user as user_module
+from classes.user_store import SharedStrings
+
+
+class DictUser:
+    """The User layout before __slots__."""
+
+    def __init__(self, std_id, name, address, email):
+        self.id = std_id
+        self.email = email
+        self.name = name
+        self.address = address
+
+
+def rows(count, names, addresses):
+    # fresh string objects per row, the way request.form hands them over
+    for i in range(count):
+        yield (f"{i:08x}-user-id", "name%d" % (i % names), "%d Main Street" % (i % addresses),
+               f"user{i}@example.com")
+
+
+def plain(count, names, addresses):
+    return [DictUser(*row) for row in rows(count, names, addresses)]
+
+
+def interned(count, names, addresses):
+    return [user_module.User(std_id, sys.intern(name), sys.intern(address), email)
+            for std_id, name, address, email in rows(count, names, addresses)]
+
+
+def shared(count, names, addresses):
+    share = SharedStrings()
+    return [user_module.User(std_id, share(name), share(address), email)
+            for std_id, name, address, email in rows(count, names, addresses)], share
+
+
+def measure(build, count, names, addresses):
+    """Return (bytes per user while held, bytes left once dropped)"""
+    gc.collect()
+    tracemalloc.start()
+    objects = build(count, names, addresses)
+    size, _ = tracemalloc.get_traced_memory()
+    del objects
+    user_module.users.clear()
+    gc.collect()
+    left, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / count, left
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--names", type=int, default=50_000, help="distinct names")
+    parser.add_argument("--addresses", type=int, help="distinct addresses (default: --count)")
+    args = parser.parse_args()
+    addresses = args.addresses or args.count
+    print(f"users: {args.count}, distinct names: {args.names}, distinct addresses: {addresses}")
+    before, _ = measure(plain, args.count, args.names, addresses)
+    print(f"dict layout:             {before:8.1f} bytes/user")
+    for label, build in (("slotted, sys.intern", interned), ("slotted, SharedStrings", shared)):
+        size, left = measure(build, args.count, args.names, addresses)
+        print(f"{label + ':':24} {size:8.1f} bytes/user ({100 * (1 - size / before):.0f}% smaller), "
+              f"{left / 2 ** 20:.1f} MiB left after dropping them")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""Load test for the index page: GET/POST mixes against a local threaded WSGI server.
+
+Each user-set size runs in its own subprocess so peak RSS is measured per size.
+Run from the repository root:
+
+    python -m benchmarks.loadtest --sizes 100 10000 1000000 --concurrency 16 \\
+        --requests 2000 --post-ratio 0.1 --output bench.json
+    python -m benchmarks.loadtest --sizes 100 10000 --compare bench.json
+
+Results are written as JSON; --compare exits non-zero when throughput drops or
+p95 latency rises by more than --tolerance against an earlier run.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import resource
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, make_server
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def run_size(size, concurrency, requests, post_ratio):
+    os.environ["USER_DB"] = ""
+    import app as webapp
+    from classes.user import User
+
+    logging.getLogger("webapp").setLevel(logging.WARNING)
+    for i in range(size):
+        webapp.users.add(User(f"seed-{i}", f"name{i % 5000}", f"{i % 1000} Main Street", f"seed{i}@example.com"))
+    server = make_server("127.0.0.1", 0, webapp.app, server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+    server.request_queue_size = max(concurrency * 2, 5)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    latencies, errors = [], []
+    counter = iter(range(requests))
+    lock = threading.Lock()
+    post_every = round(1 / post_ratio) if post_ratio > 0 else 0
+
+    def worker():
+        while True:
+            with lock:
+                number = next(counter, None)
+            if number is None:
+                return
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            started = time.perf_counter()
+            try:
+                if post_every and number % post_every == 0:
+                    body = urllib.parse.urlencode({"name": f"load{number}", "email": f"load{number}@example.com",
+                                                   "addr": "1 Load Street"})
+                    conn.request("POST", "/", body, {"Content-Type": "application/x-www-form-urlencoded"})
+                else:
+                    conn.request("GET", "/")
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except OSError as e:
+                status = str(e)
+            finally:
+                conn.close()
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if status != 200:
+                    errors.append(status)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    server.shutdown()
+
+    latencies.sort()
+    return {
+        "users": size,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "post_ratio": post_ratio,
+        "errors": len(errors),
+        "throughput_rps": round(len(latencies) / wall, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path) as f:
+        baseline = {row["users"]: row for row in json.load(f)["results"]}
+    regressed = False
+    for row in results:
+        old = baseline.get(row["users"])
+        if old is None:
+            continue
+        throughput = row["throughput_rps"] / old["throughput_rps"] - 1
+        p95 = row["p95_ms"] / old["p95_ms"] - 1
+        flag = throughput < -tolerance or p95 > tolerance
+        regressed |= flag
+        print(f"{row['users']:>9} users  throughput {throughput:+.1%}  p95 {p95:+.1%}{'  REGRESSION' if flag else ''}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--post-ratio", type=float, default=0.1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_size(args.sizes[0], args.concurrency, args.requests, args.post_ratio)))
+        return
+
+    results = []
+    for size in args.sizes:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.loadtest", "--single", "--sizes", str(size),
+             "--concurrency", str(args.concurrency), "--requests", str(args.requests),
+             "--post-ratio", str(args.post_ratio)],
+            check=True, capture_output=True, text=True).stdout
+        row = json.loads(output.strip().splitlines()[-1])
+        results.append(row)
+        print(f"{row['users']:>9} users  {row['throughput_rps']:8.1f} req/s  p50 {row['p50_ms']:8.2f} ms  "
+              f"p95 {row['p95_ms']:8.2f} ms  p99 {row['p99_ms']:8.2f} ms  rss {row['peak_rss_mb']:7.1f} MB"
+              f"  errors {row['errors']}")
+    report = {"results": results, "python": sys.version.split()[0], "timestamp": time.time()}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
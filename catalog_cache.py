@@ -0,0 +1,106 @@
+# catalog_cache.py - In-memory MCP server catalog with version-stamped ETags
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# ==================== CATALOG CACHE ====================
+
+class CatalogCache:
+    """Server catalog held in memory, stamped with a version bumped on every admin write
+
+    Versions live in this process only, so a loaded catalog is trusted for ttl
+    seconds and then re-read: writes made by other worker processes show up
+    within ttl and bump the version if they changed the catalog. ETags carry a
+    token drawn per process (again after a fork), so two workers never hand
+    out the same tag for different data.
+    """
+    def __init__(self, ttl: float = 30.0, max_users: int = 10000):
+        self.ttl = ttl
+        self.max_users = max_users
+        self.version = 0
+        self._servers: Optional[List[Dict[str, Any]]] = None
+        self._digest: Optional[str] = None
+        self._expires = 0.0
+        self._user_versions: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._user_counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self._new_token()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._new_token)
+
+    def _new_token(self):
+        self._token = uuid.uuid4().hex[:8]
+
+    def invalidate(self):
+        """Call after every write that changes the catalog"""
+        with self._lock:
+            self.version += 1
+            self._servers = None
+            self._expires = 0.0
+
+    def fresh(self) -> bool:
+        """True while the last store() or stamp() is within ttl and no write came after it"""
+        with self._lock:
+            return self._expires >= time.monotonic()
+
+    def servers(self) -> Optional[List[Dict[str, Any]]]:
+        """The cached catalog rows, or None when it has to be loaded"""
+        with self._lock:
+            if self._servers is None or self._expires < time.monotonic():
+                return None
+            return self._servers
+
+    def store(self, version: int, servers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Cache rows loaded while self.version was version; returns them"""
+        self._record(version, servers, servers)
+        return servers
+
+    def stamp(self, version: int, fingerprint: Any):
+        """Like store() for callers that keep no rows: fingerprint is any JSON value that changes with the catalog"""
+        self._record(version, fingerprint, None)
+
+    def _record(self, version: int, fingerprint: Any, servers: Optional[List[Dict[str, Any]]]):
+        digest = hashlib.sha1(json.dumps(fingerprint, sort_keys=True, default=str).encode()).hexdigest()
+        with self._lock:
+            if version != self.version:
+                return  # a write landed while loading: don't trust the old rows
+            if self._digest is not None and digest != self._digest:
+                self.version += 1  # changed by another process
+            self._servers = servers
+            self._digest = digest
+            self._expires = time.monotonic() + self.ttl
+
+    def touch_user(self, user_id: str):
+        """Call after a write that changes what user_id sees in the catalog"""
+        with self._lock:
+            self._user_versions.pop(user_id, None)
+
+    def _user_version(self, user_id: str) -> int:
+        now = time.monotonic()
+        entry = self._user_versions.get(user_id)
+        if entry is None or entry[1] < now:
+            entry = self._user_versions[user_id] = (next(self._user_counter), now + self.ttl)
+            while len(self._user_versions) > self.max_users:
+                self._user_versions.popitem(last=False)
+        self._user_versions.move_to_end(user_id)
+        return entry[0]
+
+    def etag(self, user_id: Optional[str] = None) -> str:
+        """ETag of the catalog (as seen by user_id); take it before loading the response data"""
+        with self._lock:
+            if user_id is None:
+                return f'"catalog-{self._token}-{self.version}"'
+            return f'"catalog-{self._token}-{self.version}-{self._user_version(user_id)}"'
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """True if an If-None-Match header value covers etag"""
+    if not if_none_match or not etag:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
@@ -0,0 +1,72 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip variants are built
+    brotli = None
+
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+# a year: hashed names change whenever the content does
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class Asset:
+    def __init__(self, data, mimetype, digest):
+        self.mimetype = mimetype
+        self.digest = digest
+        self.encodings = {"identity": data}
+        if mimetype.startswith(COMPRESSIBLE):
+            self._add_variant("gzip", gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                self._add_variant("br", brotli.compress(data, quality=11))
+
+    def _add_variant(self, encoding, data):
+        if len(data) < len(self.encodings["identity"]):
+            self.encodings[encoding] = data
+
+
+class AssetPipeline:
+    """Content-hashed, precompressed copies of a static directory, held in memory.
+
+    :meth:`build` reads every file once, names it ``<stem>.<hash><suffix>`` and
+    prepares gzip (and brotli, if installed) variants, so serving an asset is a
+    dict lookup and responses can be cached by browsers forever.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.names = {}
+        self.assets = {}
+
+    def build(self):
+        names, assets = {}, {}
+        for root, _, files in os.walk(self.directory):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                name = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    data = f.read()
+                digest = hashlib.sha256(data).hexdigest()[:12]
+                stem, suffix = os.path.splitext(name)
+                hashed = f"{stem}.{digest}{suffix}"
+                mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                names[name] = hashed
+                assets[hashed] = Asset(data, mimetype, digest)
+        self.names, self.assets = names, assets
+        return self
+
+    def hashed_name(self, name):
+        return self.names[name]
+
+    def find(self, hashed, accept_encoding):
+        """Return (asset, encoding, body) for the best variant the client accepts, or None."""
+        asset = self.assets.get(hashed)
+        if asset is None:
+            return None
+        for encoding in ("br", "gzip"):
+            if encoding in asset.encodings and accept_encoding[encoding]:
+                return asset, encoding, asset.encodings[encoding]
+        return asset, "identity", asset.encodings["identity"]
@@ -0,0 +1,58 @@
+import threading
+import time
+import uuid
+from collections import deque
+
+
+class Broadcaster:
+    """Recent change events in a ring buffer, for clients that poll or reconnect.
+
+    Clients never hold a subscription: each one remembers the id of the last
+    event it saw and asks for anything newer with :meth:`read`, so an idle
+    client costs nothing between reads. Ids are ``<token>:<n>``; the token
+    names this process, because counters in different workers are unrelated.
+    """
+
+    def __init__(self, size=1000, replay_window=5.0):
+        self.token = uuid.uuid4().hex[:8]
+        self.replay_window = replay_window
+        self._events = deque(maxlen=size)
+        self._next = 1
+        self._changed = threading.Condition()
+
+    @property
+    def cursor(self):
+        return f"{self.token}:{self._next - 1}"
+
+    def publish(self, event, data):
+        with self._changed:
+            self._events.append((self._next, time.monotonic(), event, data))
+            self._next += 1
+            self._changed.notify_all()
+
+    def read(self, cursor=None, timeout=0):
+        """Return (events, head, reset) for events after ``cursor``, waiting up to ``timeout`` seconds.
+
+        Events are ``(id, event, data)`` and ``head`` is the cursor to resume
+        from next time. ``reset`` is True when events after the cursor have
+        already left the buffer and the client must reload.
+        A cursor from another process replays the last ``replay_window``
+        seconds, so a client that moves between workers sees recent changes
+        again rather than missing them.
+        """
+        token, _, number = (cursor or "").partition(":")
+        with self._changed:
+            if not cursor:
+                after = self._next - 1
+            elif token == self.token and number.isdigit():
+                after = int(number)
+                oldest = self._events[0][0] if self._events else self._next
+                if after < oldest - 1:
+                    return [], self.cursor, True
+            else:
+                since = time.monotonic() - self.replay_window
+                after = next((n - 1 for n, at, _, _ in self._events if at >= since), self._next - 1)
+            if timeout and after >= self._next - 1:
+                self._changed.wait(timeout)
+            events = [(f"{self.token}:{n}", event, data) for n, _, event, data in self._events if n > after]
+            return events, self.cursor, False
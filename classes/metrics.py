@@ -0,0 +1,85 @@
+import threading
+from bisect import bisect_left
+
+# seconds; the Prometheus client defaults
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+# bytes
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestMetrics:
+    """Per-route request latency, size and in-flight numbers in Prometheus text format."""
+
+    def __init__(self, prefix="app"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self._latency = {}
+        self._request_size = {}
+        self._response_size = {}
+        self._responses = {}
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self, method, route, status, seconds, request_size, response_size):
+        key = (method, route)
+        with self._lock:
+            self.in_flight -= 1
+            self._histogram(self._latency, key, LATENCY_BUCKETS).observe(seconds)
+            self._histogram(self._request_size, key, SIZE_BUCKETS).observe(request_size)
+            if response_size is not None:
+                self._histogram(self._response_size, key, SIZE_BUCKETS).observe(response_size)
+            status_key = key + (str(status),)
+            self._responses[status_key] = self._responses.get(status_key, 0) + 1
+
+    @staticmethod
+    def _histogram(histograms, key, buckets):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(buckets)
+        return histogram
+
+    def render(self):
+        p = self.prefix
+        with self._lock:
+            lines = [f"# HELP {p}_requests_in_flight Requests currently being handled.",
+                     f"# TYPE {p}_requests_in_flight gauge",
+                     f"{p}_requests_in_flight {self.in_flight}",
+                     f"# HELP {p}_responses_total Responses sent, by route and status.",
+                     f"# TYPE {p}_responses_total counter"]
+            for (method, route, status), count in sorted(self._responses.items()):
+                lines.append(f'{p}_responses_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+            for name, help_text, histograms in (
+                    ("request_duration_seconds", "Request latency.", self._latency),
+                    ("request_size_bytes", "Request body size.", self._request_size),
+                    ("response_size_bytes", "Response body size.", self._response_size)):
+                lines += [f"# HELP {p}_{name} {help_text}", f"# TYPE {p}_{name} histogram"]
+                for (method, route), histogram in sorted(histograms.items()):
+                    lines += _histogram_lines(f"{p}_{name}", f'method="{method}",route="{route}"', histogram)
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(name, labels, histogram):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
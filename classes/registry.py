@@ -0,0 +1,89 @@
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class Registry:
+    """Tracks constructed objects without keeping them alive forever.
+
+    ``weak`` registries hold weak references, so an object leaves the registry
+    as soon as nothing else uses it. ``capacity`` caps the number of entries and
+    evicts the least recently registered or touched one. A disabled registry
+    ignores :meth:`register` unless a :meth:`scope` is active, which is how
+    tracking is switched on for just one request or session.
+    """
+
+    def __init__(self, weak=True, capacity=None, enabled=True):
+        self.weak = weak
+        self.capacity = capacity
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        # re-entrant: a weakref callback can fire while the lock is held
+        self._lock = threading.RLock()
+        self._scope = ContextVar(f"registry-scope-{id(self)}", default=None)
+
+    def register(self, obj):
+        scoped = self._scope.get()
+        if scoped is not None:
+            scoped.register(obj)
+        elif self.enabled:
+            self._add(obj)
+        return obj
+
+    def touch(self, obj):
+        """Mark ``obj`` as recently used so capacity eviction skips it."""
+        with self._lock:
+            if id(obj) in self._entries:
+                self._entries.move_to_end(id(obj))
+
+    def discard(self, obj):
+        with self._lock:
+            self._entries.pop(id(obj), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @contextmanager
+    def scope(self, weak=None, capacity=None):
+        """Send registrations in this context to a fresh registry, dropped on exit."""
+        scoped = Registry(self.weak if weak is None else weak, capacity)
+        token = self._scope.set(scoped)
+        try:
+            yield scoped
+        finally:
+            self._scope.reset(token)
+            scoped.clear()
+
+    def __len__(self):
+        return len(self._live())
+
+    def __iter__(self):
+        return iter(self._live())
+
+    def __repr__(self):
+        return f"Registry({self._live()!r})"
+
+    def _add(self, obj):
+        key = id(obj)
+        entry = weakref.ref(obj, lambda ref: self._forget(key, ref)) if self.weak else obj
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if self.capacity is not None:
+                while len(self._entries) > self.capacity:
+                    self._entries.popitem(last=False)
+
+    def _forget(self, key, ref):
+        with self._lock:
+            if self._entries.get(key) is ref:
+                del self._entries[key]
+
+    def _live(self):
+        with self._lock:
+            entries = list(self._entries.values())
+        if not self.weak:
+            return entries
+        return [obj for obj in (ref() for ref in entries) if obj is not None]
@@ -0,0 +1,57 @@
+import threading
+
+from markupsafe import Markup
+
+
+class RowCache:
+    """Rendered table-row fragments per user id.
+
+    Subscribe it to a UserStore and it drops a user's fragment whenever that
+    user is updated or removed, so unchanged rows are rendered exactly once.
+    Rendering runs outside the lock; a fragment whose user changed while it
+    was being rendered is returned but not kept.
+    """
+
+    def __init__(self, render_row, capacity=100_000):
+        self.render_row = render_row
+        self.capacity = capacity
+        self._rows = {}
+        # every change is stamped; _changed holds the latest stamp per user, oldest first
+        self._stamp = 0
+        self._changed = {}
+        # newest stamp dropped from _changed to keep it within capacity
+        self._forgotten = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, event, user):
+        with self._lock:
+            self._rows.pop(user.id, None)
+            self._stamp += 1
+            self._changed.pop(user.id, None)
+            self._changed[user.id] = self._stamp
+            if len(self._changed) > self.capacity:
+                self._forgotten = self._changed.pop(next(iter(self._changed)))
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get(self, user):
+        row = self._rows.get(user.id)
+        if row is None:
+            stamp = self._stamp
+            row = Markup(self.render_row(user))
+            with self._lock:
+                if self._changed.get(user.id, self._forgotten) > stamp:
+                    return row
+                if len(self._rows) >= self.capacity:
+                    # oldest rendered first: dicts keep insertion order
+                    del self._rows[next(iter(self._rows))]
+                self._rows[user.id] = row
+        return row
+
+    def rows(self, users):
+        return (self.get(user) for user in users)
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
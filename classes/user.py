@@ -1,13 +1,21 @@
-users = []
+from classes.registry import Registry
+
+# tracking is opt-in: set users.enabled = True (with an optional capacity), or
+# wrap a request in users.scope(); either way only weak references are held
+users = Registry(weak=True, enabled=False)
 
 
 class User:
+    # no per-instance __dict__: four slots instead of a dict per user
+    __slots__ = ("id", "email", "name", "address", "__weakref__")
+
     def __init__(self, std_id, name, address, email):
         self.id = std_id
         self.email = email
+        # a UserStore swaps repeated names and addresses for one shared copy
         self.name = name
         self.address = address
-        users.append(self)
+        users.register(self)
 
     def get_name_cap(self):
         return self.name.capitalize()
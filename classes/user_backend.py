@@ -0,0 +1,340 @@
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    address TEXT,
+    email TEXT,
+    origin TEXT NOT NULL
+);
+-- workers check emails only against their own users; this is what stops two of them saving one twice
+DELETE FROM users WHERE email <> '' AND rowid NOT IN (
+    SELECT MIN(rowid) FROM users WHERE email <> '' GROUP BY email COLLATE NOCASE
+);
+CREATE UNIQUE INDEX IF NOT EXISTS users_email ON users (email COLLATE NOCASE) WHERE email <> '';
+CREATE TABLE IF NOT EXISTS user_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL,
+    op TEXT NOT NULL,
+    origin TEXT NOT NULL
+);
+-- how far each process has read user_changes, and when it last read
+CREATE TABLE IF NOT EXISTS change_readers (
+    origin TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    seen REAL NOT NULL
+);
+-- every change up to this seq has been pruned from user_changes
+CREATE TABLE IF NOT EXISTS user_changes_pruned (through INTEGER NOT NULL);
+INSERT INTO user_changes_pruned (through) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM user_changes_pruned);
+"""
+
+# seq of the newest change, even once the log has been pruned empty
+LAST_CHANGE = ("SELECT MAX(COALESCE((SELECT MAX(seq) FROM user_changes), 0), "
+               "(SELECT through FROM user_changes_pruned))")
+
+_STOP = object()
+# longest pause between retries of a batch the database refused
+MAX_RETRY_DELAY = 5.0
+# attempts at the last pending batch once close() was called
+CLOSE_ATTEMPTS = 3
+# seconds between prunes of the change log
+PRUNE_INTERVAL = 60.0
+# a process that has not read the change log for this many seconds no longer holds back pruning
+READER_TIMEOUT = 600.0
+# changes kept for processes that are still behind, at most
+CHANGE_LOG_WINDOW = 10_000
+
+logger = logging.getLogger("webapp")
+
+
+class SQLiteUserBackend:
+    """Write-behind SQLite persistence for user records.
+
+    Writes are queued and a single writer thread group-commits them, so a request
+    never waits on an fsync. The database runs in WAL mode with
+    ``synchronous=NORMAL``: a crash can lose the last few committed batches but
+    never corrupts the file. Every write is also appended to ``user_changes``,
+    which is how :meth:`changes` picks up writes made by other processes (other
+    gunicorn workers). A batch the database refuses is logged and retried with
+    backoff ahead of newer writes; :meth:`flush` waits until it commits.
+
+    Adds are plain inserts and updates plain updates, so the ``users`` primary
+    key and unique email index catch a user another worker saved first. Such a
+    write is logged and dropped, along with later writes for the same id, and
+    :meth:`changes` then reports the stored row (or a delete) for that id so
+    the store can give way to the database.
+
+    The writer also prunes ``user_changes`` every ``PRUNE_INTERVAL`` seconds,
+    dropping what every process that read it within ``READER_TIMEOUT`` has
+    read, and never keeping more than ``CHANGE_LOG_WINDOW`` changes. A process
+    that finds unread changes pruned gets every stored row from
+    :meth:`changes` instead.
+    """
+
+    def __init__(self, path, batch_size=500, flush_interval=0.05):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._data_version = None
+        self._last_change = 0
+        # wall-clock time of the last load() or changes(), published in change_readers
+        self._last_read = 0.0
+        # ids whose writes the database refused, until changes() hands them back
+        self._rejected = set()
+        self._rejected_lock = threading.Lock()
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+        self._start()
+
+    def _start(self):
+        # tags our own change log entries so changes() skips them
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex}"
+        self._queue = queue.Queue()
+        self._read_lock = threading.Lock()
+        self._reader = self._connect(check_same_thread=False)
+        # one connection per request thread for has_changes(), which takes no lock
+        self._probes = threading.local()
+        self._writer = threading.Thread(target=self._write_loop, name="user-writer", daemon=True)
+        self._writer.start()
+
+    def after_fork(self):
+        """Reopen connections and restart the writer in a forked worker process.
+
+        Neither threads nor SQLite connections survive ``fork()``, so a backend
+        created before forking (gunicorn ``preload_app``) must call this in each
+        child. The child keeps the parent's change-log position.
+        """
+        self._start()
+
+    def _connect(self, **kwargs):
+        conn = sqlite3.connect(self.path, timeout=30, **kwargs)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def load(self):
+        """Return every stored user as (id, name, address, email) rows."""
+        with self._read_lock:
+            self._data_version = self._reader.execute("PRAGMA data_version").fetchone()[0]
+            return self._read_all()
+
+    def _read_all(self):
+        # one read transaction, so the rows are exactly those of the changes up to _last_change
+        self._reader.execute("BEGIN")
+        try:
+            self._last_change = self._reader.execute(LAST_CHANGE).fetchone()[0]
+            rows = self._reader.execute("SELECT id, name, address, email FROM users ORDER BY rowid").fetchall()
+        finally:
+            self._reader.execute("COMMIT")
+        self._last_read = time.time()
+        # registered at once: until then, other processes may prune changes this one has not read
+        with self._reader:
+            self._register(self._reader)
+        return rows
+
+    def _register(self, conn):
+        conn.execute("INSERT INTO change_readers (origin, seq, seen) VALUES (?, ?, ?) "
+                     "ON CONFLICT(origin) DO UPDATE SET seq = excluded.seq, seen = excluded.seen",
+                     (self.origin, self._last_change, self._last_read))
+
+    def has_changes(self):
+        """Return False when :meth:`changes` has nothing new; safe from any thread without a lock.
+
+        Every thread polls ``PRAGMA data_version`` on a connection of its own,
+        so this may say True for a change another thread already took.
+        """
+        if self._rejected:
+            return True
+        probes = self._probes
+        conn = getattr(probes, "conn", None)
+        if conn is None:
+            conn = probes.conn = sqlite3.connect(self.path, timeout=30)
+            probes.data_version = None
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        changed, probes.data_version = data_version != probes.data_version, data_version
+        return changed
+
+    def changes(self):
+        """Return the changes other processes committed since the last call.
+
+        Each change is ``("save", (id, name, address, email))`` for an insert or
+        update, or ``("delete", (id,))``. Ids whose own writes were refused
+        come last, as the row the database holds for them now. When changes this
+        process never read have been pruned, the only change is
+        ``("reload", rows)`` with every stored row, as :meth:`load` returns them.
+        """
+        with self._rejected_lock:
+            rejected, self._rejected = self._rejected, set()
+        with self._read_lock:
+            data_version = self._reader.execute("PRAGMA data_version").fetchone()[0]
+            rows = []
+            if data_version != self._data_version:
+                self._data_version = data_version
+                pruned = self._reader.execute("SELECT through FROM user_changes_pruned").fetchone()[0]
+                if pruned > self._last_change:
+                    logger.warning("user change log was pruned past %d, reloading every user", self._last_change)
+                    return [("reload", self._read_all())]
+                rows = self._reader.execute(
+                    "SELECT c.seq, c.op, c.origin, c.id, u.id, u.name, u.address, u.email FROM user_changes c "
+                    "LEFT JOIN users u ON u.id = c.id WHERE c.seq > ? ORDER BY c.seq",
+                    (self._last_change,)).fetchall()
+                if rows:
+                    self._last_change = rows[-1][0]
+            self._last_read = time.time()
+            stored = {user_id: self._reader.execute(
+                "SELECT id, name, address, email FROM users WHERE id = ?", (user_id,)).fetchone()
+                for user_id in rejected}
+        changes = []
+        for _, op, origin, user_id, *row in rows:
+            if origin == self.origin:
+                continue
+            if op == "delete":
+                changes.append((op, (user_id,)))
+            elif row[0] is not None:
+                # a save whose row is gone was followed by a delete we will also see
+                changes.append(("save", tuple(row)))
+        for user_id, row in stored.items():
+            changes.append(("save", row) if row is not None else ("delete", (user_id,)))
+        return changes
+
+    def insert(self, user):
+        """Queue the insert of a new user."""
+        self._queue.put(("insert", (user.id, user.name, user.address, user.email)))
+
+    def update(self, user):
+        """Queue an update of the stored user with the same id."""
+        self._queue.put(("update", (user.id, user.name, user.address, user.email)))
+
+    def delete(self, user_id):
+        self._queue.put(("delete", (user_id,)))
+
+    def flush(self):
+        """Block until every queued write has been committed."""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._writer.join()
+        self._reader.close()
+
+    def _write_loop(self):
+        conn = self._connect()
+        # writes whose commit failed; retried, ahead of newer writes, until they commit
+        pending = []
+        retry_delay = self.flush_interval
+        attempts = 0
+        stopping = False
+        next_prune = time.monotonic()
+        while True:
+            if time.monotonic() >= next_prune:
+                self._prune(conn)
+                next_prune = time.monotonic() + PRUNE_INTERVAL
+            batch = []
+            if not stopping:
+                if not pending:
+                    try:
+                        batch.append(self._queue.get(timeout=max(next_prune - time.monotonic(), 0)))
+                    except queue.Empty:
+                        continue
+                deadline = time.monotonic() + self.flush_interval
+                try:
+                    while len(pending) + len(batch) < self.batch_size and (not batch or batch[-1] is not _STOP):
+                        batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    pass
+                stopping = bool(batch) and batch[-1] is _STOP
+            writes = pending + [item for item in batch if item is not _STOP]
+            try:
+                refused = self._commit(conn, writes)
+            except sqlite3.Error:
+                attempts += 1
+                if stopping and attempts >= CLOSE_ATTEMPTS:
+                    logger.exception("giving up on %d unsaved user writes at shutdown", len(writes))
+                else:
+                    logger.exception("saving %d user writes failed, retrying in %.2fs", len(writes), retry_delay)
+                    pending = writes
+                    time.sleep(retry_delay)
+                    retry_delay = min(retry_delay * 2, MAX_RETRY_DELAY)
+                    continue
+            else:
+                self._reject(refused)
+            # committed (or abandoned at shutdown): only now are the writes done
+            for _ in writes:
+                self._queue.task_done()
+            pending = []
+            retry_delay = self.flush_interval
+            attempts = 0
+            if stopping:
+                self._queue.task_done()
+                try:
+                    with conn:
+                        conn.execute("DELETE FROM change_readers WHERE origin = ?", (self.origin,))
+                except sqlite3.Error:
+                    logger.exception("could not unregister from the user change log")
+                conn.close()
+                return
+
+    def _commit(self, conn, writes):
+        """Commit writes in one transaction; returns (op, params, reason) for each one refused"""
+        with self._rejected_lock:
+            held = set(self._rejected)
+        refused = []
+        with conn:
+            for op, params in writes:
+                user_id = params[0]
+                if user_id in held:
+                    # written against our copy of a user the database disagrees with
+                    refused.append((op, params, "an earlier write for this id was refused"))
+                    continue
+                try:
+                    if op == "insert":
+                        conn.execute("INSERT INTO users (id, name, address, email, origin) VALUES (?, ?, ?, ?, ?)",
+                                     params + (self.origin,))
+                    elif op == "update":
+                        cursor = conn.execute("UPDATE users SET name = ?, address = ?, email = ? WHERE id = ?",
+                                              params[1:] + params[:1])
+                        if cursor.rowcount == 0:
+                            raise sqlite3.IntegrityError("no stored user with this id")
+                    else:
+                        conn.execute("DELETE FROM users WHERE id = ?", params)
+                except sqlite3.IntegrityError as e:
+                    # a failed statement is undone on its own; the rest of the batch still commits
+                    refused.append((op, params, str(e)))
+                    held.add(user_id)
+                    continue
+                conn.execute("INSERT INTO user_changes (id, op, origin) VALUES (?, ?, ?)",
+                             (user_id, op, self.origin))
+        return refused
+
+    def _prune(self, conn):
+        """Publish how far this process has read user_changes, then drop what every reader has read"""
+        now = time.time()
+        try:
+            with conn:
+                if self._last_read > now - READER_TIMEOUT:
+                    self._register(conn)
+                conn.execute("DELETE FROM change_readers WHERE seen <= ?", (now - READER_TIMEOUT,))
+                newest = conn.execute(LAST_CHANGE).fetchone()[0]
+                oldest_read = conn.execute("SELECT MIN(seq) FROM change_readers").fetchone()[0]
+                through = max(newest - CHANGE_LOG_WINDOW, newest if oldest_read is None else oldest_read)
+                pruned = conn.execute("SELECT through FROM user_changes_pruned").fetchone()[0]
+                if through > pruned:
+                    conn.execute("DELETE FROM user_changes WHERE seq <= ?", (through,))
+                    conn.execute("UPDATE user_changes_pruned SET through = ?", (through,))
+        except sqlite3.Error:
+            logger.exception("pruning the user change log failed")
+
+    def _reject(self, refused):
+        for op, params, reason in refused:
+            logger.warning("user %s refused for %s: %s", op, params[0], reason)
+        with self._rejected_lock:
+            self._rejected.update(params[0] for _, params, _ in refused)
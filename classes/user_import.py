@@ -0,0 +1,44 @@
+import csv
+import json
+
+CSV_TYPES = ("text/csv",)
+JSONL_TYPES = ("application/jsonl", "application/x-ndjson", "application/x-jsonlines")
+
+
+def import_format(mimetype):
+    if mimetype in CSV_TYPES:
+        return "csv"
+    if mimetype in JSONL_TYPES:
+        return "jsonl"
+    return None
+
+
+def iter_records(stream, fmt):
+    """Yield (row number, record dict or None, error or None) from a binary line stream.
+
+    Lines are decoded one at a time, so the upload is never held in memory.
+    CSV input needs a header row naming the columns; ``addr`` is accepted for
+    ``address`` to match the HTML form.
+    """
+    lines = (line.decode("utf-8", "replace") for line in stream)
+    if fmt == "csv":
+        for number, row in enumerate(csv.DictReader(lines), start=1):
+            if None in row:
+                yield number, None, "too many columns"
+                continue
+            if "addr" in row and "address" not in row:
+                row["address"] = row.pop("addr")
+            yield number, row, None
+        return
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, None, f"invalid json: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield number, None, "expected a json object"
+            continue
+        yield number, record, None
@@ -0,0 +1,33 @@
+from functools import lru_cache
+from json.encoder import encode_basestring_ascii
+
+FIELDS = ("id", "name", "email", "address")
+
+
+def json_string(value):
+    return "null" if value is None else encode_basestring_ascii(value)
+
+
+@lru_cache(maxsize=64)
+def serializer(fields=FIELDS):
+    """Return a function that writes a User straight to a JSON object string.
+
+    The key layout is formatted once per field list; serializing a user is one
+    string escape per field and a %-format, with no intermediate dict.
+    """
+    template = "{" + ",".join(f'"{field}":%s' for field in fields) + "}"
+
+    def serialize(user):
+        return template % tuple(json_string(getattr(user, field)) for field in fields)
+    return serialize
+
+
+def parse_fields(value):
+    """Turn a ``?fields=`` value into a field tuple; raises ValueError on unknown names."""
+    if not value:
+        return FIELDS
+    fields = tuple(field.strip() for field in value.split(",") if field.strip())
+    unknown = [field for field in fields if field not in FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    return fields
@@ -0,0 +1,121 @@
+import threading
+from array import array
+
+FIELDS = ("name", "email", "address")
+# marks a word-start gram, so "\x01sm" means "some word starts with sm"
+WORD_START = "\x01"
+# joins a document's fields so one substring test covers all of them
+SEPARATOR = "\x00"
+
+
+def _grams(values):
+    grams = set()
+    for value in values:
+        for word in value.split():
+            grams.add(WORD_START + word[:1])
+            grams.add(WORD_START + word[:2])
+        grams.update(value[i:i + 3] for i in range(len(value) - 2))
+    return grams
+
+
+class UserSearchIndex:
+    """Incremental prefix and substring index over user names, emails and addresses.
+
+    Every user becomes a document holding its lower-cased fields. Posting lists
+    of document numbers are kept per trigram, for substring queries of three or
+    more characters, and per one- and two-character word start, for shorter
+    prefix queries. A query walks its rarest posting list and checks each
+    candidate, stopping once ``limit`` matches are found.
+
+    Subscribe it to a UserStore to keep it current. Searches take no lock:
+    postings and documents live in one ``_index`` tuple, which a rebuild
+    replaces whole, so a search always sees a matching pair.
+    """
+
+    def __init__(self):
+        # (postings, docs): gram -> document numbers, and document -> (user id, text)
+        self._index = ({}, [])
+        self._doc_of = {}
+        self._dead = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, event, user):
+        with self._lock:
+            self._remove(user.id)
+            if event != "remove":
+                self._add(user)
+
+    def __len__(self):
+        return len(self._doc_of)
+
+    def add(self, user):
+        with self._lock:
+            self._remove(user.id)
+            self._add(user)
+
+    def _add(self, user):
+        values = [" ".join((getattr(user, field) or "").lower().split()) for field in FIELDS]
+        text = SEPARATOR + SEPARATOR.join(values)
+        postings, docs = self._index
+        doc = len(docs)
+        docs.append((user.id, text))
+        self._doc_of[user.id] = doc
+        for gram in _grams(values):
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = array("I")
+            posting.append(doc)
+
+    def _remove(self, user_id):
+        doc = self._doc_of.pop(user_id, None)
+        if doc is None:
+            return
+        self._index[1][doc] = None
+        self._dead += 1
+        if self._dead > len(self._doc_of) and self._dead > 1000:
+            self._rebuild()
+
+    def _rebuild(self):
+        # built aside and swapped in at the end: searches keep using the old index
+        postings, docs, doc_of = {}, [], {}
+        for entry in self._index[1]:
+            if entry is None:
+                continue
+            user_id, text = entry
+            doc = len(docs)
+            docs.append(entry)
+            doc_of[user_id] = doc
+            for gram in _grams(text[1:].split(SEPARATOR)):
+                postings.setdefault(gram, array("I")).append(doc)
+        self._index = (postings, docs)
+        self._doc_of = doc_of
+        self._dead = 0
+
+    def search(self, query, limit=50):
+        """Return ids of users whose fields contain ``query``.
+
+        Queries shorter than three characters match the start of a word.
+        """
+        query = query.lower().strip()
+        if not query:
+            return []
+        query = " ".join(query.split())
+        if len(query) < 3:
+            grams = [WORD_START + query]
+            patterns = (SEPARATOR + query, " " + query)
+        else:
+            grams = {query[i:i + 3] for i in range(len(query) - 2)}
+            patterns = (query,)
+        postings, docs = self._index
+        candidates = min((postings.get(gram, ()) for gram in grams), key=len)
+        found = []
+        for doc in candidates:
+            entry = docs[doc]
+            if entry is None:
+                continue
+            text = entry[1]
+            if any(pattern in text for pattern in patterns):
+                found.append(entry[0])
+                if len(found) >= limit:
+                    break
+        return found
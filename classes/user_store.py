@@ -0,0 +1,278 @@
+import logging
+import threading
+import time
+from bisect import bisect_right
+
+from classes.user import User
+
+logger = logging.getLogger("webapp")
+
+# removed users whose ids still work as page cursors, newest kept
+REMOVED_CURSORS = 100_000
+# distinct names and addresses a store shares, most recently used kept
+SHARED_STRINGS = 50_000
+
+
+class DuplicateUserError(ValueError):
+    pass
+
+
+class SharedStrings:
+    """One shared copy of each repeated string, like sys.intern but bounded.
+
+    Interned strings live as long as the process (on 3.12 even once nothing
+    uses them), and addresses are mostly unique, so interning them leaks.
+    This table keeps the ``capacity`` most recently used values; dropping
+    one only stops sharing it, the users holding it keep their copy.
+    Not thread-safe: the owning store calls it under its write lock.
+    """
+
+    def __init__(self, capacity=SHARED_STRINGS):
+        self.capacity = capacity
+        self._strings = {}
+
+    def __len__(self):
+        return len(self._strings)
+
+    def __call__(self, value):
+        if not value:
+            return value
+        shared = self._strings.pop(value, value)
+        # re-inserted at the end: dicts keep insertion order, so the front is least recently used
+        self._strings[shared] = shared
+        if len(self._strings) > self.capacity:
+            del self._strings[next(iter(self._strings))]
+        return shared
+
+
+class UserStore:
+    """In-memory users keyed by id, with a unique email index and insertion order.
+
+    When a ``backend`` is given it is the durable copy: the store is warmed from it
+    by :meth:`load`, writes are handed to it, and :meth:`sync` applies changes
+    other processes made to it.
+
+    Listeners registered with :meth:`subscribe` are called as
+    ``listener(event, user)`` with event ``"add"``, ``"update"`` or ``"remove"``
+    after every change, including ones picked up by :meth:`sync`. A listener
+    that raises is logged and skipped; the change itself still stands.
+
+    Safe to share between request threads: writes are serialized by a lock and
+    reads take no lock at all. Reads only use single dict lookups and the
+    ``_order`` lists, which writers append to (ids before seqs, so a reader's
+    seqs never run ahead of its ids) and replace wholesale on removal.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self._by_id = {}
+        self._by_email = {}
+        # insertion order as (ids, seqs): ids[i] was added with sequence number seqs[i]
+        self._order = ([], [])
+        self._seq_of = {}
+        # seqs of removed users, so a page cursor naming one still finds its place
+        self._removed_seq_of = {}
+        self._next_seq = 0
+        # bumped on every change to the user set, whoever made it
+        self.version = 0
+        self.last_modified = time.time()
+        self._listeners = []
+        # names and addresses repeat across users; each is held once
+        self._strings = SharedStrings()
+        self._write_lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __iter__(self):
+        return self.iter_after()
+
+    def __contains__(self, user_id):
+        return user_id in self._by_id
+
+    def get(self, user_id):
+        return self._by_id.get(user_id)
+
+    def exists(self, user_id):
+        return user_id in self._by_id
+
+    def email_exists(self, email):
+        return email.lower() in self._by_email
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def load(self):
+        with self._write_lock:
+            for row in self.backend.load():
+                self._apply_row(row)
+
+    def sync(self):
+        # most requests find nothing new, and find it without waiting on writers
+        if self.backend is None or not self.backend.has_changes():
+            return
+        # one lock from reading the change log to applying it, so two request
+        # threads can never apply overlapping batches out of order
+        with self._write_lock:
+            for op, row in self.backend.changes():
+                if op == "delete":
+                    self._unindex(row[0])
+                elif op == "reload":
+                    self._reload(row)
+                else:
+                    self._apply_row(row)
+
+    def _reload(self, rows):
+        """Make the store hold exactly ``rows``, touching only the users that differ."""
+        stored = {row[0] for row in rows}
+        for user_id in [user_id for user_id in self._by_id if user_id not in stored]:
+            self._unindex(user_id)
+        for row in rows:
+            user = self._by_id.get(row[0])
+            if user is None or (user.name, user.address, user.email) != tuple(row[1:]):
+                self._apply_row(row)
+
+    def _apply_row(self, row):
+        """Make the store hold a committed database row; the database wins any conflict."""
+        user_id, email = row[0], (row[3] or "").lower()
+        holder = self._by_email.get(email) if email else None
+        if holder is not None and holder != user_id:
+            # the unique index let this row commit, so holder's own write of the email cannot
+            logger.warning("user %s gives up email %s to %s, saved by another process", holder, row[3], user_id)
+            self._unindex(holder)
+        if user_id in self._by_id:
+            self._update(user_id, *row[1:])
+        else:
+            self._index(User(*row))
+
+    def add(self, user):
+        with self._write_lock:
+            self._index(user)
+            if self.backend is not None:
+                self.backend.insert(user)
+        return user
+
+    def remove(self, user_id):
+        with self._write_lock:
+            user = self._unindex(user_id)
+            if user is not None and self.backend is not None:
+                self.backend.delete(user_id)
+        return user
+
+    def update(self, user_id, name, address, email):
+        """Replace the fields of an existing user; returns None for an unknown id."""
+        with self._write_lock:
+            user = self._update(user_id, name, address, email)
+            if user is not None and self.backend is not None:
+                self.backend.update(user)
+        return user
+
+    def _update(self, user_id, name, address, email):
+        user = self._by_id.get(user_id)
+        if user is None:
+            return None
+        # every check comes before the first change, so a refused update leaves the user as it was
+        if not all(value is None or isinstance(value, str) for value in (name, address, email)):
+            raise TypeError("fields must be strings")
+        old_email = (user.email or "").lower()
+        new_email = (email or "").lower()
+        if new_email != old_email:
+            if new_email and new_email in self._by_email:
+                raise DuplicateUserError(f"email {email} already exists")
+            self._by_email.pop(old_email, None)
+            if new_email:
+                self._by_email[new_email] = user_id
+        user.name = self._strings(name)
+        user.address = self._strings(address)
+        user.email = email
+        self._touch("update", user)
+        return user
+
+    def _index(self, user):
+        if user.id in self._by_id:
+            raise DuplicateUserError(f"user id {user.id} already exists")
+        email = (user.email or "").lower()
+        if email and email in self._by_email:
+            raise DuplicateUserError(f"email {user.email} already exists")
+        user.name = self._strings(user.name)
+        user.address = self._strings(user.address)
+        self._by_id[user.id] = user
+        if email:
+            self._by_email[email] = user.id
+        self._seq_of[user.id] = self._next_seq
+        self._removed_seq_of.pop(user.id, None)
+        ids, seqs = self._order
+        ids.append(user.id)
+        seqs.append(self._next_seq)
+        self._next_seq += 1
+        self._touch("add", user)
+        return user
+
+    def _unindex(self, user_id):
+        user = self._by_id.pop(user_id, None)
+        if user is None:
+            return None
+        email = (user.email or "").lower()
+        if self._by_email.get(email) == user_id:
+            del self._by_email[email]
+        ids, seqs = self._order
+        seq = self._removed_seq_of[user_id] = self._seq_of[user_id]
+        del self._seq_of[user_id]
+        if len(self._removed_seq_of) > REMOVED_CURSORS:
+            del self._removed_seq_of[next(iter(self._removed_seq_of))]
+        position = bisect_right(seqs, seq) - 1
+        # copy-on-write: readers holding the old lists keep a consistent view
+        self._order = (ids[:position] + ids[position + 1:], seqs[:position] + seqs[position + 1:])
+        self._touch("remove", user)
+        return user
+
+    def _touch(self, event, user):
+        self.version += 1
+        self.last_modified = time.time()
+        for listener in self._listeners:
+            try:
+                listener(event, user)
+            except Exception:
+                logger.exception("user %s listener failed for %s", event, user.id)
+
+    def iter_after(self, after=None):
+        """Return an iterator over users added after ``after``.
+
+        Iterates a snapshot of the order, skipping users removed meanwhile.
+        ``after`` may name a removed user. Raises KeyError when it is not a
+        known user id.
+        """
+        ids, end, start = self._snapshot(after)
+        by_id = self._by_id
+        return (user for user in map(by_id.get, ids[start:end]) if user is not None)
+
+    def page(self, after=None, limit=50):
+        """Return (users, next_after) for up to ``limit`` users added after ``after``.
+
+        ``after`` may name a removed user. Raises KeyError when it is not a
+        known user id.
+        """
+        ids, end, start = self._snapshot(after)
+        page_ids = ids[start:min(start + limit, end)]
+        next_after = page_ids[-1] if page_ids and start + limit < end else None
+        by_id = self._by_id
+        return [user for user in map(by_id.get, page_ids) if user is not None], next_after
+
+    def range(self, start, stop):
+        """Return the users at insertion positions ``start`` up to ``stop``."""
+        ids, seqs = self._order
+        end = len(seqs)
+        by_id = self._by_id
+        return [user for user in map(by_id.get, ids[max(start, 0):min(stop, end)]) if user is not None]
+
+    def _snapshot(self, after):
+        """Return (ids, end, start): the order list, its consistent length and the cursor position."""
+        ids, seqs = self._order
+        end = len(seqs)
+        if after:
+            # a removed user is filed under _removed_seq_of before it leaves _seq_of
+            seq = self._seq_of.get(after)
+            start = bisect_right(seqs, self._removed_seq_of[after] if seq is None else seq, 0, end)
+        else:
+            start = 0
+        return ids, end, start
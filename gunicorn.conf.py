@@ -0,0 +1,24 @@
+"""Production serving: gunicorn -c gunicorn.conf.py app:app
+
+Every worker process runs several request threads over one shared UserStore;
+the app is imported once in the master (preload) and forked, so startup work
+like loading users and hashing static assets happens only once. Tune with:
+
+    WEB_BIND     address to listen on (default 0.0.0.0:8000)
+    WEB_WORKERS  worker processes (default: one per CPU)
+    WEB_THREADS  request threads per worker (default 8)
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("WEB_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_WORKERS", multiprocessing.cpu_count()))
+threads = int(os.environ.get("WEB_THREADS", 8))
+worker_class = "gthread"
+preload_app = True
+accesslog = None
+
+
+def post_fork(server, worker):
+    import app
+    app.after_fork()
@@ -0,0 +1,44 @@
+# migrations.py - Versioned schema migrations for the FastAPI apps' SQLite databases
+from dataclasses import dataclass
+from typing import Callable, List, Sequence, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# ==================== MIGRATIONS ====================
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    # SQL statements run in order, or a function that gets the Connection
+    steps: Union[Sequence[str], Callable[[Connection], None]]
+
+    def apply(self, connection: Connection):
+        if callable(self.steps):
+            self.steps(connection)
+        else:
+            for statement in self.steps:
+                connection.execute(text(statement))
+
+def schema_version(connection: Connection) -> int:
+    """Version of the last migration applied to this database (PRAGMA user_version)"""
+    return connection.execute(text("PRAGMA user_version")).scalar()
+
+def migrate(connection: Connection, migrations: List[Migration]) -> List[int]:
+    """Apply pending migrations in version order; returns the versions applied
+
+    Run it from engine.begin() (or run_sync on an async connection). pysqlite
+    does not open a transaction for DDL alone, so keep steps idempotent
+    (IF NOT EXISTS / IF EXISTS): a migration interrupted halfway is re-run whole.
+    """
+    current = schema_version(connection)
+    applied = []
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version <= current:
+            continue
+        migration.apply(connection)
+        # PRAGMA does not take bound parameters; version is an int from our own list
+        connection.execute(text(f"PRAGMA user_version = {int(migration.version)}"))
+        applied.append(migration.version)
+    return applied
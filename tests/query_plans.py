@@ -0,0 +1,38 @@
+"""EXPLAIN QUERY PLAN helpers shared by the query plan tests."""
+import sqlite3
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+USER_ID = "plan-user"
+
+
+@contextmanager
+def captured_sql(sync_engine):
+    """Collect the (statement, parameters) of every SELECT and UPDATE sent while inside"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE")):
+            statements.append((statement, parameters))
+
+    event.listen(sync_engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", capture)
+
+
+def plan(path, statement, parameters):
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute("EXPLAIN QUERY PLAN " + statement, parameters or ()).fetchall()
+    return [row[-1] for row in rows]
+
+
+def assert_planned(path, statements, index, table):
+    """Every statement is planned with index and never scans table"""
+    assert statements, "no query captured"
+    for statement, parameters in statements:
+        steps = plan(path, statement, parameters)
+        assert any(index in step for step in steps), f"{index} unused: {' | '.join(steps)}"
+        assert not any(step.startswith(f"SCAN {table}") for step in steps), f"{table} scanned: {' | '.join(steps)}"
@@ -0,0 +1,51 @@
+"""ai_stuff_simpple's query plan checks; test_query_plans.py runs this file in its own process.
+
+ai_stuff_simpple's models share table names with ai_stuff's, so the two
+cannot be imported into one process, and pytest collects this file only when
+it is named on the command line.
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+
+import ai_stuff_simpple  # noqa: E402
+from migrations import migrate  # noqa: E402
+from query_plans import USER_ID, assert_planned, captured_sql  # noqa: E402
+
+
+async def captured(path, run):
+    """Statements run(db_ops) sends to a migrated database holding sample servers"""
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    # an undisposed aiosqlite engine keeps its worker threads and hangs the exit
+    try:
+        async with async_engine.begin() as conn:
+            await conn.run_sync(migrate, ai_stuff_simpple.MIGRATIONS)
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            db_ops = ai_stuff_simpple.AsyncMCPDatabaseOperations(session)
+            await db_ops.initialize_sample_servers()
+            for server in (await db_ops.get_available_servers())[:4]:
+                await db_ops.connect_server(server.server_id, USER_ID)
+            with captured_sql(async_engine.sync_engine) as statements:
+                await run(db_ops)
+        return statements
+    finally:
+        await async_engine.dispose()
+
+
+@pytest.mark.parametrize("run, index", [
+    pytest.param(lambda db_ops: db_ops.get_available_servers(), "ix_mcpserver_user_active",
+                 id="available servers"),
+    pytest.param(lambda db_ops: db_ops.get_user_servers(USER_ID, after="", limit=51), "ix_mcpserver_user_server",
+                 id="your servers page"),
+    pytest.param(lambda db_ops: db_ops.get_connected_servers(USER_ID, limit=51), "ix_mcpserver_user_server",
+                 id="connected servers page"),
+])
+def test_ai_stuff_simpple_plans(tmp_path, run, index):
+    path = str(tmp_path / "plans.db")
+    statements = asyncio.run(captured(path, run))
+    assert_planned(path, statements, index, "mcpserver")
@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+from catalog_cache import CatalogCache
+
+
+def test_etags_differ_between_processes_at_the_same_version():
+    first, second = CatalogCache(), CatalogCache()
+    assert first.version == second.version
+    assert first.etag("user") != second.etag("user")
+    assert first.etag() != second.etag()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork()")
+def test_forked_child_draws_its_own_token():
+    catalog = CatalogCache()
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.write(write, catalog.etag().encode())
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert os.read(read, 100).decode() != catalog.etag()
+
+
+def test_stamp_keeps_no_rows_and_notices_other_writers():
+    catalog = CatalogCache()
+    assert not catalog.fresh()
+
+    catalog.stamp(catalog.version, [3, 12])
+    assert catalog.fresh() and catalog.servers() is None
+    version = catalog.version
+
+    catalog.stamp(catalog.version, [4, 13])  # another process added a server
+    assert catalog.version == version + 1
+
+    catalog.invalidate()
+    assert not catalog.fresh()
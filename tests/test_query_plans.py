@@ -0,0 +1,93 @@
+"""Check with EXPLAIN QUERY PLAN that the hot queries use the migrated indexes.
+
+Each test applies the app's MIGRATIONS to a fresh database, runs one database
+operation and captures the SQL it sends; each SELECT/UPDATE must be planned
+with the expected index and must not scan the table. ai_stuff and
+ai_stuff_simpple define conflicting models, so the ai_stuff_simpple checks in
+simpple_query_plans.py run in a pytest process of their own.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("sqlmodel")
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+import ai_stuff  # noqa: E402
+from migrations import migrate  # noqa: E402
+from query_plans import USER_ID, assert_planned, captured_sql  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(scope="module")
+def database(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("plans") / "plans.db")
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as connection:
+        migrate(connection, ai_stuff.MIGRATIONS)
+    with Session(engine, expire_on_commit=False) as session:
+        db_ops = ai_stuff.MCPDatabaseOperations(session)
+        db_ops.initialize_sample_servers()
+        db_ops.get_or_create_user(ai_stuff.UserCreate(user_id=USER_ID, email="", name=USER_ID))
+        for server in db_ops.get_available_mcp_servers()[:4]:
+            db_ops.connect_user_to_server(USER_ID, server.id)
+        yield path, engine, db_ops
+    engine.dispose()
+
+
+@pytest.mark.parametrize("run, index, table", [
+    pytest.param(lambda db_ops: db_ops.get_user_connections(USER_ID, after=0, limit=51, is_connected=True),
+                 "ix_usermcpconnection_connected", "usermcpconnection", id="connected connections page"),
+    pytest.param(lambda db_ops: db_ops.get_user_connections(USER_ID, after=0, limit=51),
+                 "ix_usermcpconnection_user_server", "usermcpconnection", id="connections page"),
+    pytest.param(lambda db_ops: db_ops.get_servers_with_user_status(USER_ID, after=0, limit=51),
+                 "ix_usermcpconnection_", "usermcpconnection", id="servers with status"),
+    pytest.param(lambda db_ops: db_ops.get_servers_with_user_status(USER_ID, after=2, limit=51),
+                 "INTEGER PRIMARY KEY (rowid>?)", "mcpserver", id="servers with status page"),
+    pytest.param(lambda db_ops: db_ops.update_connection_config(USER_ID, 1, {"k": "v"}),
+                 "ix_usermcpconnection_user_server", "usermcpconnection", id="update config"),
+    pytest.param(lambda db_ops: db_ops.disconnect_user_from_server(USER_ID, 1),
+                 "ix_usermcpconnection_user_server", "usermcpconnection", id="disconnect"),
+])
+def test_ai_stuff_plans(database, run, index, table):
+    path, engine, db_ops = database
+    with captured_sql(engine) as statements:
+        run(db_ops)
+    assert_planned(path, [(s, p) for s, p in statements if table in s], index, table)
+
+
+def test_legacy_migration_drops_duplicate_connections(tmp_path):
+    """A pre-migration database with duplicate pairs ends up with one row per pair"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        # version 1 is the pre-migration schema; user_version 0 as on a legacy database
+        migrate(connection, ai_stuff.MIGRATIONS[:1])
+        connection.execute(text("PRAGMA user_version = 0"))
+        for connected in (0, 1):
+            connection.execute(text(
+                "INSERT INTO usermcpconnection (user_id, server_id, is_connected) VALUES (:user_id, 1, :connected)"
+            ), {"user_id": USER_ID, "connected": connected})
+    with engine.begin() as connection:
+        applied = migrate(connection, ai_stuff.MIGRATIONS)
+        rows = connection.execute(text("SELECT is_connected FROM usermcpconnection")).scalars().all()
+        indexes = set(connection.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'usermcpconnection'"
+        )).scalars())
+    engine.dispose()
+
+    assert applied == [1, 2, 3]
+    assert rows == [1]
+    assert {"ix_usermcpconnection_user_server", "ix_usermcpconnection_connected"} <= indexes
+
+
+def test_ai_stuff_simpple_plans():
+    result = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", os.path.join(HERE, "simpple_query_plans.py")],
+        cwd=os.path.dirname(HERE), capture_output=True, text=True, timeout=300,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+pytest.importorskip("flask")
+os.environ["USER_DB"] = ""
+
+import app as webapp  # noqa: E402
+
+
+def responses(route):
+    prefix = f'app_responses_total{{method="GET",route="{route}",status="200"}} '
+    return sum(int(line[len(prefix):]) for line in webapp.metrics.render().splitlines() if line.startswith(prefix))
+
+
+def test_streamed_requests_are_counted_once():
+    client = webapp.app.test_client()
+    before_index, before_api = responses("/"), responses("/api/users")
+
+    response = client.get("/?stream=1")
+    response.get_data()
+    response.close()
+    response = client.get("/api/users", headers={"Accept": "application/x-ndjson"})
+    response.get_data()
+    response.close()
+
+    assert webapp.metrics.in_flight == 0
+    assert responses("/") == before_index + 1
+    assert responses("/api/users") == before_api + 1
@@ -0,0 +1,35 @@
+from classes.row_cache import RowCache
+from classes.user import User
+
+
+def test_row_changed_while_rendering_is_not_kept():
+    user = User("u1", "Ada", None, None)
+    renders = []
+
+    def render(user):
+        renders.append(user.name)
+        if len(renders) == 1:
+            # an update lands between reading the user and caching the fragment
+            user.name = "Grace"
+            cache("update", user)
+            return "<tr>Ada</tr>"
+        return f"<tr>{user.name}</tr>"
+
+    cache = RowCache(render)
+
+    assert cache.get(user) == "<tr>Ada</tr>"
+    assert cache.get(user) == "<tr>Grace</tr>"
+    assert cache.get(user) == "<tr>Grace</tr>"
+    assert renders == ["Ada", "Grace"]
+
+
+def test_change_history_stays_within_capacity():
+    cache = RowCache(lambda user: user.name, capacity=2)
+    users = [User(f"u{i}", f"name {i}", None, None) for i in range(5)]
+    for user in users:
+        cache.get(user)
+        cache("update", user)
+
+    assert len(cache._changed) == 2
+    assert cache.get(users[0]) == "name 0"
+    assert len(cache) == 1
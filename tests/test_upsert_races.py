@@ -0,0 +1,64 @@
+"""Hammer one user/server pair from many threads and check the upserts hold up.
+
+Every thread loops over connect, update-config, disconnect and profile update
+for the same user and server. With the old select-then-write code, two threads
+could both miss the row and insert it twice; the upserts must leave exactly one
+user row and one connection row and raise nothing.
+"""
+import threading
+
+import pytest
+
+pytest.importorskip("sqlmodel")
+
+from sqlalchemy import func  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from ai_stuff import MIGRATIONS, MCPDatabaseOperations, User, UserCreate, UserMCPConnection  # noqa: E402
+from db_engine import create_tuned_engine, get_profile  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+USER_ID = "race-user"
+THREADS = 16
+ITERATIONS = 25
+
+
+def hammer(engine, server_id, worker, errors):
+    try:
+        with Session(engine, expire_on_commit=False) as session:
+            db_ops = MCPDatabaseOperations(session)
+            for i in range(ITERATIONS):
+                db_ops.create_or_update_user(UserCreate(user_id=USER_ID, email=f"w{worker}@example.com", name=f"w{worker}-{i}"))
+                db_ops.connect_user_to_server(USER_ID, server_id, {"worker": worker, "i": i})
+                db_ops.update_connection_config(USER_ID, server_id, {"worker": worker, "i": i, "updated": True})
+                if i % 3 == 0:
+                    db_ops.disconnect_user_from_server(USER_ID, server_id)
+    except Exception as exc:  # collected and reported by the test
+        errors.append(f"worker {worker}: {exc!r}")
+
+
+def test_concurrent_upserts_keep_one_row_each(tmp_path):
+    engine = create_tuned_engine(f"sqlite:///{tmp_path / 'races.db'}", get_profile(pool_size=THREADS, max_overflow=0))
+    with engine.begin() as connection:
+        migrate(connection, MIGRATIONS)
+    with Session(engine) as session:
+        db_ops = MCPDatabaseOperations(session)
+        db_ops.initialize_sample_servers()
+        server_id = db_ops.get_available_mcp_servers()[0].id
+
+    errors = []
+    threads = [threading.Thread(target=hammer, args=(engine, server_id, worker, errors)) for worker in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with Session(engine) as session:
+        users = session.exec(select(func.count()).select_from(User).where(User.user_id == USER_ID)).one()
+        connections = session.exec(select(func.count()).select_from(UserMCPConnection).where(
+            UserMCPConnection.user_id == USER_ID, UserMCPConnection.server_id == server_id
+        )).one()
+    engine.dispose()
+
+    assert errors == []
+    assert (users, connections) == (1, 1)
@@ -0,0 +1,162 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from classes.user import User
+from classes.user_backend import SQLiteUserBackend
+from classes.user_store import UserStore
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two stores over one database file, like two gunicorn workers"""
+    path = str(tmp_path / "users.db")
+    stores = [UserStore(SQLiteUserBackend(path)), UserStore(SQLiteUserBackend(path))]
+    for store in stores:
+        store.load()
+    yield path, stores
+    for store in stores:
+        store.backend.close()
+
+
+def settle(stores):
+    for store in stores:
+        store.backend.flush()
+    for store in stores:
+        store.sync()
+
+
+def stored_rows(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT id, name, address, email FROM users ORDER BY id").fetchall()
+
+
+def store_rows(store):
+    return sorted((user.id, user.name, user.address, user.email) for user in store)
+
+
+def test_same_id_added_by_two_workers_keeps_the_first(workers):
+    path, (a, b) = workers
+    a.add(User("x", "Alice", None, "alice@example.com"))
+    a.backend.flush()
+    b.add(User("x", "Bob", None, "bob@example.com"))
+    b.update("x", "Bob", "Street 1", "bob@example.com")
+    settle([a, b])
+
+    assert stored_rows(path) == [("x", "Alice", None, "alice@example.com")]
+    assert store_rows(a) == store_rows(b) == stored_rows(path)
+    assert not b.email_exists("bob@example.com")
+
+
+def test_same_email_added_by_two_workers_keeps_the_first(workers):
+    path, (a, b) = workers
+    a.add(User("a1", "Alice", None, "shared@example.com"))
+    a.backend.flush()
+    b.add(User("b1", "Bob", None, "SHARED@example.com"))
+    settle([a, b])
+
+    assert stored_rows(path) == [("a1", "Alice", None, "shared@example.com")]
+    assert store_rows(a) == store_rows(b) == stored_rows(path)
+
+
+def test_synced_row_wins_over_an_unsaved_local_email(workers):
+    path, (a, b) = workers
+    a.add(User("a1", "Alice", None, "shared@example.com"))
+    a.backend.flush()
+    b.add(User("b1", "Bob", None, "shared@example.com"))
+    b.sync()  # sees a1 before its own insert of b1 is refused
+    settle([a, b])
+
+    assert store_rows(a) == store_rows(b) == stored_rows(path) == [("a1", "Alice", None, "shared@example.com")]
+
+
+def test_sync_with_nothing_new_does_not_wait_for_writers(workers):
+    path, (a, b) = workers
+    a.add(User("a1", "Alice", None, None))
+    settle([a, b])
+    held, release = threading.Event(), threading.Event()
+
+    def writer():
+        with b._write_lock:
+            held.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    held.wait(5)
+    started = time.monotonic()
+    b.sync()
+    waited = time.monotonic() - started
+    release.set()
+    thread.join()
+
+    assert waited < 1
+
+
+def change_log(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM user_changes").fetchone()[0]
+
+
+def prune(store):
+    with sqlite3.connect(store.backend.path) as conn:
+        store.backend._prune(conn)
+
+
+def test_changes_every_worker_read_are_pruned(workers):
+    path, (a, b) = workers
+    for i in range(20):
+        a.add(User(f"u{i}", "Ada", None, None))
+    a.backend.flush()
+    a.sync()
+    prune(a)
+    prune(b)
+    assert change_log(path) == 20  # b has not read them yet
+
+    b.sync()
+    prune(b)
+    assert change_log(path) == 0
+    assert store_rows(b) == stored_rows(path)
+
+
+def test_worker_behind_the_window_reloads(workers, monkeypatch, caplog):
+    monkeypatch.setattr("classes.user_backend.CHANGE_LOG_WINDOW", 5)
+    path, (a, b) = workers
+    b.add(User("gone", "Old", None, None))
+    b.backend.flush()
+    a.sync()
+    a.remove("gone")
+    for i in range(20):
+        a.add(User(f"u{i}", "Ada", None, None))
+    a.update("u0", "Grace", None, None)
+    a.backend.flush()
+    prune(a)
+    assert change_log(path) == 5
+
+    b.sync()
+    assert "reloading every user" in caplog.text
+    assert store_rows(b) == stored_rows(path)
+    assert "gone" not in b
+
+
+def test_worker_started_after_a_prune_does_not_reload(workers, caplog):
+    path, (a, b) = workers
+    a.add(User("u1", "Ada", None, None))
+    a.backend.flush()
+    a.sync()
+    b.sync()
+    prune(b)
+    prune(a)
+    assert change_log(path) == 0
+
+    late = UserStore(SQLiteUserBackend(path))
+    late.load()
+    a.add(User("u2", "Grace", None, None))
+    a.backend.flush()
+    late.sync()
+    late.backend.close()
+
+    assert "reloading" not in caplog.text
+    assert store_rows(late) == stored_rows(path)
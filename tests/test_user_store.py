@@ -0,0 +1,80 @@
+import pytest
+
+from classes import user_store
+from classes.user import User
+from classes.user_store import SharedStrings, UserStore
+
+
+def make_store(count):
+    store = UserStore()
+    for i in range(count):
+        store.add(User(f"u{i}", f"name {i}", None, None))
+    return store
+
+
+def ids(users):
+    return [user.id for user in users]
+
+
+def test_cursor_of_a_removed_user_still_pages():
+    store = make_store(5)
+    page, next_after = store.page(limit=2)
+    assert next_after == "u1"
+
+    store.remove("u1")
+
+    assert ids(store.page(next_after, 2)[0]) == ["u2", "u3"]
+    assert ids(store.iter_after(next_after)) == ["u2", "u3", "u4"]
+
+
+def test_cursor_of_a_re_added_user_uses_its_new_place():
+    store = make_store(3)
+    store.remove("u0")
+    store.add(User("u0", "back", None, None))
+
+    assert ids(store.iter_after("u0")) == []
+
+
+def test_unknown_cursor_raises():
+    store = make_store(2)
+    with pytest.raises(KeyError):
+        store.page("nobody")
+
+
+def test_removed_cursors_are_bounded(monkeypatch):
+    monkeypatch.setattr(user_store, "REMOVED_CURSORS", 2)
+    store = make_store(4)
+    for user_id in ("u0", "u1", "u2"):
+        store.remove(user_id)
+
+    assert ids(store.iter_after("u2")) == ["u3"]
+    with pytest.raises(KeyError):
+        store.page("u0")
+
+
+def fresh(value):
+    """An equal string that is a new object, as each request hands over"""
+    return "".join(list(value))
+
+
+def test_store_shares_repeated_names_and_addresses():
+    assert fresh("Ada") is not fresh("Ada")
+    store = UserStore()
+    first = store.add(User("u1", fresh("Ada"), fresh("Main Street"), None))
+    second = store.add(User("u2", fresh("Ada"), fresh("Elm Street"), None))
+    store.update("u2", fresh("Ada"), fresh("Main Street"), None)
+
+    assert second.name is first.name and second.address is first.address
+
+
+def test_shared_strings_keep_the_most_recently_used():
+    share = SharedStrings(capacity=2)
+    a = share(fresh("aa"))
+    share(fresh("bb"))
+    assert share(fresh("aa")) is a  # aa is now the most recent
+    share(fresh("cc"))  # drops bb
+    b = share(fresh("bb"))  # drops aa
+
+    assert len(share) == 2
+    assert share(fresh("bb")) is b
+    assert share(fresh("aa")) is not a
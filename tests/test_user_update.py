@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+pytest.importorskip("flask")
+os.environ["USER_DB"] = ""
+
+import app as webapp  # noqa: E402
+from classes.user import User  # noqa: E402
+from classes.user_store import UserStore  # noqa: E402
+
+
+def test_put_rejects_non_string_fields():
+    client = webapp.app.test_client()
+    created = client.post("/api/users", json={"id": "put-1", "name": "Ada", "email": "put-1@example.com"})
+    assert created.status_code == 201
+
+    response = client.put("/users/put-1", json={"name": 5})
+
+    assert response.status_code == 400
+    assert webapp.users.get("put-1").name == "Ada"
+    assert "put-1" in webapp.search_index.search("ada", 10)
+    assert client.get("/api/users").status_code == 200
+
+
+def test_refused_update_leaves_user_unchanged():
+    store = UserStore()
+    user = store.add(User("u1", "Ada", "Street 1", "ada@example.com"))
+
+    with pytest.raises(TypeError):
+        store.update("u1", "Ada", 5, "new@example.com")
+
+    assert (user.name, user.address, user.email) == ("Ada", "Street 1", "ada@example.com")
+    assert store.email_exists("ada@example.com") and not store.email_exists("new@example.com")
+
+
+def test_failing_listener_does_not_stop_the_others():
+    store = UserStore()
+    seen = []
+
+    def broken(event, user):
+        raise RuntimeError("listener bug")
+
+    store.subscribe(broken)
+    store.subscribe(lambda event, user: seen.append((event, user.id)))
+    store.add(User("u1", "Ada", None, None))
+    store.update("u1", "Grace", None, None)
+
+    assert seen == [("add", "u1"), ("update", "u1")]
+    assert store.get("u1").name == "Grace"